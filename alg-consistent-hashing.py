@@ -15,55 +15,784 @@ Two problems exist with the basic implementation:
  - Depending on the hash algorithm, nodes may not be evenly distributed around
    the circle
 
-A simple way to solve both is to add nodes to the ring multiple times.
+A simple way to solve both is to add nodes to the ring multiple times. Each
+copy is a "virtual node" (or replica), and when a server goes down its arcs
+are scattered around the ring, so its load is spread across many neighbours
+instead of just one. Giving a node more replicas than the others gives it a
+proportionally larger share of the ring, which is how weights are implemented.
 
+Virtual nodes only make the load *likely* to be balanced. "Consistent hashing
+with bounded loads" (Mirrokni, Thorup, Zadimoghaddam) makes it a guarantee:
+every node gets a capacity of `ceil(c * m / n)` for m keys, n nodes and some
+c > 1. A key walks clockwise from its hash and lands on the first node that
+still has room, so no node ever exceeds c times the average load, while keys
+still only move a bounded number of hops when membership changes.
+
+The hash only needs to be uniform, not secure, so for hot paths a cheap
+non-cryptographic hash (FNV-1a with a murmur-style finalizer, or xxHash) is
+much faster than SHA-256. Looking up a whole batch of keys at once also lets
+us replace one binary search per key with a single vectorized `searchsorted`
+over an array copy of the ring.
+
+When membership changes, only the arcs next to the added or removed points
+change owner. Walking the old and new rings together in sorted order gives
+those arcs exactly, so a rebalance only has to look at the keys that hash
+into them instead of re-assigning everything.
+
+The ring isn't the only way to get consistent assignments:
+
+ - Jump consistent hash (Lamping, Veach) needs no memory at all: it computes
+   a bucket number in [0, n) directly from the key, in O(log n) steps. The
+   catch is that buckets are numbered, so only the last one can be removed.
+
+ - Rendezvous, or highest-random-weight, hashing scores every node against
+   the key and picks the highest score. Removing a node only moves the keys
+   it owned, and weights fall out naturally, but lookups are O(n).
+
+ - Maglev (Google's network load balancer) fills a fixed-size lookup table
+   by letting each node claim slots in its own pseudo-random order. Lookups
+   are a single array index, at the cost of rebuilding the table on every
+   membership change and moving slightly more keys than a ring would.
 """
 
-from bisect import bisect, bisect_left
+from bisect import bisect, bisect_left, insort
+from copy import deepcopy
 from hashlib import sha256
-from typing import Any
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+MASK_64 = 2 ** 64 - 1
+FNV_OFFSET = 0xcbf29ce484222325
+FNV_PRIME = 0x100000001b3
+
+
+def sha256_64(data: bytes) -> int:
+    # the first 8 bytes of the digest are already uniform over 64 bits,
+    # so there's no need to render and parse the whole thing
+    return int.from_bytes(sha256(data).digest()[:8], "big")
+
+
+def fmix64(h: int) -> int:
+    """ MurmurHash3's finalizer, which makes every input bit affect every output bit. """
+    h ^= h >> 33
+    h = (h * 0xff51afd7ed558ccd) & MASK_64
+    h ^= h >> 33
+    h = (h * 0xc4ceb9fe1a85ec53) & MASK_64
+    h ^= h >> 33
+    return h
+
+
+def fnv1a_64(data: bytes) -> int:
+    h = FNV_OFFSET
+    for byte in data:
+        h = ((h ^ byte) * FNV_PRIME) & MASK_64
+    return fmix64(h)
+
+
+HASH_FUNCTIONS: Dict[str, Callable[[bytes], int]] = {
+    "sha256": sha256_64,
+    "fnv1a": fnv1a_64,
+}
+
+if xxhash is not None:
+    HASH_FUNCTIONS["xxhash"] = xxhash.xxh64_intdigest
+
+
+def fnv1a_64_many(data: List[bytes]) -> "np.ndarray":
+    """
+    The same hash as `fnv1a_64`, computed for a whole batch at once. The keys
+    are packed into a zero-padded 2D byte matrix and we process one column
+    (byte position) at a time for every key simultaneously, leaving a key's
+    hash alone once we're past its end. uint64 arithmetic wraps around just
+    like the `& MASK_64` in the scalar version.
+    """
+    n = len(data)
+    lengths = np.fromiter(map(len, data), dtype=np.int64, count=n)
+    width = int(lengths.max()) if n else 0
+
+    h = np.full(n, FNV_OFFSET, dtype=np.uint64)
+    if width:
+        matrix = np.array(data, dtype=f"S{width}").view(np.uint8).reshape(n, width)
+        prime = np.uint64(FNV_PRIME)
+
+        for col in range(width):
+            stepped = (h ^ matrix[:, col]) * prime
+            h = np.where(lengths > col, stepped, h)
+
+    h ^= h >> np.uint64(33)
+    h *= np.uint64(0xff51afd7ed558ccd)
+    h ^= h >> np.uint64(33)
+    h *= np.uint64(0xc4ceb9fe1a85ec53)
+    h ^= h >> np.uint64(33)
+    return h
+
+
+class SortedKeys:
+    """
+    A sorted list stored as a list of sorted blocks, with the maximum of each
+    block kept in a separate list. Finding the right block is a binary search
+    over the maxes, and inserting into a block only shifts at most
+    `2 * load` elements, so additions and removals are O(log n) plus a small
+    constant rather than the O(n) of shifting one big list.
+
+    Blocks that grow past `2 * load` are split in half, and empty blocks are
+    dropped, which keeps every block within a constant factor of `load`.
+    """
+
+    def __init__(self, load: int = 256) -> None:
+        self.load = load
+        self.blocks: List[List[int]] = []
+        self.maxes: List[int] = []
+        self.length = 0
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self) -> Iterator[int]:
+        for block in self.blocks:
+            yield from block
+
+    def add(self, key: int) -> None:
+        if not self.blocks:
+            self.blocks.append([key])
+            self.maxes.append(key)
+            self.length = 1
+            return
+
+        # find the first block whose max is >= key, or append to the last one
+        i = bisect_left(self.maxes, key)
+        if i == len(self.maxes):
+            i -= 1
+            self.blocks[i].append(key)
+            self.maxes[i] = key
+        else:
+            insort(self.blocks[i], key)
+
+        self.length += 1
+
+        block = self.blocks[i]
+        if len(block) > 2 * self.load:
+            half = len(block) // 2
+            self.blocks[i:i + 1] = [block[:half], block[half:]]
+            self.maxes[i:i + 1] = [block[half - 1], block[-1]]
+
+    def remove(self, key: int) -> None:
+        i = bisect_left(self.maxes, key)
+        if i == len(self.maxes):
+            raise KeyError(key)
+
+        block = self.blocks[i]
+        j = bisect_left(block, key)
+        if block[j] != key:
+            raise KeyError(key)
+
+        block.pop(j)
+        self.length -= 1
+
+        if not block:
+            del self.blocks[i]
+            del self.maxes[i]
+        elif j == len(block):
+            self.maxes[i] = block[-1]
+
+    def iter_from(self, key: int) -> Iterator[int]:
+        """ Yield every element strictly greater than `key`, wrapping around to the start. """
+        if not self.blocks:
+            return
+
+        n = len(self.blocks)
+        i = bisect(self.maxes, key)
+        if i == n:
+            # key is past the last element, so start from the very beginning
+            i, j = 0, 0
+        else:
+            j = bisect(self.blocks[i], key)
+
+        yield from self.blocks[i][j:]
+        for step in range(1, n):
+            yield from self.blocks[(i + step) % n]
+        yield from self.blocks[i][:j]
+
+    def successor(self, key: int) -> int:
+        """ Return the first element strictly greater than `key`, wrapping around to the smallest. """
+        i = bisect(self.maxes, key)
+        if i == len(self.maxes):
+            return self.blocks[0][0]
+
+        block = self.blocks[i]
+        return block[bisect(block, key)]
 
 
 class ConsistentHash:
-    def __init__(self) -> None:
-        # this is a sorted list which enables binary search, however
-        # it should probably be a self-balancing binary search tree,
-        # so that additions and removals of nodes are O(log n) rather
-        # than O(n)
-        self.keys = []
-        self.key_to_node = {}
-        self.total_slots = 64
+    def __init__(
+        self,
+        replicas: int = 100,
+        load_factor: Optional[float] = None,
+        hash_function: str = "sha256",
+    ) -> None:
+        if load_factor is not None and load_factor <= 1:
+            raise ValueError("load_factor must be greater than 1")
+
+        if hash_function not in HASH_FUNCTIONS:
+            raise ValueError(f"Unknown hash function {hash_function!r}")
+
+        self.hash_function = hash_function
+        self.hash_bytes = HASH_FUNCTIONS[hash_function]
+
+        # every point on the ring, kept sorted for binary search
+        self.keys = SortedKeys()
+        self.key_to_node: Dict[int, str] = {}
+        self.total_slots = 2 ** 64
+
+        # the points each node owns, so removal doesn't need to rehash
+        self.replicas = replicas
+        self.weights: Dict[str, float] = {}
+        self.total_weight = 0.0
+        self.node_to_keys: Dict[str, List[int]] = {}
+
+        # array copies of the ring for assign_many, rebuilt lazily whenever
+        # the membership version no longer matches
+        self.version = 0
+        self.arrays_version = -1
+        self.points = None
+        self.owners = None
+        self.nodes: List[str] = []
+
+        # only used for bounded loads: where each identifier was placed
+        self.load_factor = load_factor
+        self.loads: Dict[str, int] = {}
+        self.assignments: Dict[str, str] = {}
+
+    def copy(self) -> "ConsistentHash":
+        """ Snapshot the ring, e.g. before a membership change to diff against. """
+        return deepcopy(self)
 
     def _hash(self, s: str) -> int:
-        h = sha256()
-        h.update(bytes(s, encoding="utf8"))
-        return int(h.hexdigest(), 16) % self.total_slots
+        return self.hash_bytes(s.encode("utf8"))
+
+    def _hash_many(self, identifiers: List[str]) -> "np.ndarray":
+        data = [s.encode("utf8") for s in identifiers]
+
+        if self.hash_function == "fnv1a":
+            return fnv1a_64_many(data)
+
+        # the other hashes run in C already, so all we save is building the array
+        return np.fromiter(map(self.hash_bytes, data), dtype=np.uint64, count=len(data))
+
+    def add_node(self, node: str, weight: float = 1.0) -> None:
+        if node in self.node_to_keys:
+            raise Exception("Node already exists")
+
+        if weight <= 0:
+            raise ValueError("weight must be positive")
+
+        points = []
+        for i in range(max(1, round(self.replicas * weight))):
+            key = self._hash(f"{node}#{i}")
+
+            # two replicas landing on the same 64-bit point is astronomically
+            # unlikely; if it happens, the first one keeps it
+            if key in self.key_to_node:
+                continue
+
+            self.keys.add(key)
+            self.key_to_node[key] = node
+            points.append(key)
+
+        self.weights[node] = weight
+        self.total_weight += weight
+        self.node_to_keys[node] = points
+        self.loads[node] = 0
+        self.version += 1
+
+        if self.load_factor is not None and self.assignments:
+            self._rebalance(set(points))
+
+    def _rebalance(self, new_points: set) -> None:
+        """
+        Placements are sticky, so after a node joins, re-place (as if new) the
+        identifiers whose clockwise walk now reaches it before their current
+        node, and enough others to bring every node back under its capacity.
+        """
+        moved = []
+        for identifier, owner in self.assignments.items():
+            for point in self.keys.iter_from(self._hash(identifier)):
+                if point in new_points:
+                    moved.append(identifier)
+                    break
+                if self.key_to_node[point] == owner:
+                    break
+
+        # the capacities once everything is placed again. no node is left
+        # with more than that, so none of them takes back what it gives up
+        placed = len(self.assignments)
+        excess = {
+            node: load - int(-(-self.load_factor * placed * self.weights[node] // self.total_weight))
+            for node, load in self.loads.items()
+        }
+        for identifier in moved:
+            excess[self.assignments[identifier]] -= 1
+
+        moving = set(moved)
+        for identifier, owner in self.assignments.items():
+            if excess[owner] > 0 and identifier not in moving:
+                moved.append(identifier)
+                excess[owner] -= 1
+
+        for identifier in moved:
+            self.release(identifier)
+
+        for identifier in moved:
+            self.assign(identifier)
+
+    def remove_node(self, node: str) -> None:
+        points = self.node_to_keys.pop(node, None)
+        if points is None:
+            raise Exception("Node does not exist")
+
+        for key in points:
+            self.keys.remove(key)
+            del self.key_to_node[key]
+
+        self.total_weight -= self.weights.pop(node)
+        del self.loads[node]
+        self.version += 1
+
+        if self.load_factor is not None:
+            # the orphaned identifiers get placed again as if they were new
+            orphans = [k for k, v in self.assignments.items() if v == node]
+            for identifier in orphans:
+                del self.assignments[identifier]
+
+            for identifier in orphans:
+                self.assign(identifier)
+
+    def capacity(self, node: str) -> int:
+        """ The most identifiers `node` may hold under bounded loads (counting one more to be placed). """
+        placed = len(self.assignments) + 1
+        # ceiling division (math.ceil would be shadowed by math.py in this directory)
+        return int(-(-self.load_factor * placed * self.weights[node] // self.total_weight))
+
+    def assign(self, identifier: str) -> str:
+        if not self.key_to_node:
+            raise Exception("Ring is empty")
+
+        key = self._hash(identifier)
+
+        if self.load_factor is None:
+            # find the first node to the right of this key,
+            # looping back to the start of the ring if necessary
+            return self.key_to_node[self.keys.successor(key)]
+
+        existing = self.assignments.get(identifier)
+        if existing is not None:
+            return existing
+
+        # walk clockwise until we find a node that isn't full. the total
+        # capacity is at least c times the number of keys, so this terminates
+        for point in self.keys.iter_from(key):
+            node = self.key_to_node[point]
+            if self.loads[node] < self.capacity(node):
+                break
+
+        self.loads[node] += 1
+        self.assignments[identifier] = node
+        return node
+
+    def _ring_arrays(self) -> None:
+        if self.arrays_version == self.version:
+            return
+
+        self.nodes = list(self.node_to_keys)
+        index = {node: i for i, node in enumerate(self.nodes)}
+
+        n = len(self.keys)
+        self.points = np.fromiter(self.keys, dtype=np.uint64, count=n)
+        self.owners = np.fromiter(
+            (index[self.key_to_node[key]] for key in self.keys), dtype=np.int32, count=n
+        )
+        self.arrays_version = self.version
+
+    def assign_many(self, identifiers: Iterable[str]) -> "np.ndarray":
+        """
+        Assign a whole batch of identifiers at once, returning an array of
+        indices into `self.nodes`. Gives exactly the same answers as calling
+        `assign` on each identifier with the same hash function.
+        """
+        if np is None:
+            raise ImportError("assign_many requires numpy")
+
+        if self.load_factor is not None:
+            raise Exception("Bounded-load placements must be made one at a time with assign")
+
+        if not self.key_to_node:
+            raise Exception("Ring is empty")
+
+        self._ring_arrays()
+
+        hashes = self._hash_many(list(identifiers))
+        # side="right" finds the first point strictly greater, like bisect does
+        idx = np.searchsorted(self.points, hashes, side="right")
+        idx[idx == len(self.points)] = 0
+
+        return self.owners[idx]
+
+    def release(self, identifier: str) -> None:
+        """ Forget a bounded-load placement, freeing up capacity on its node. """
+        node = self.assignments.pop(identifier)
+        self.loads[node] -= 1
+
+    def ownership(self) -> Dict[str, float]:
+        """ The fraction of the hash space each node owns, to check the ring is balanced. """
+        share = {node: 0 for node in self.node_to_keys}
+        if not self.key_to_node:
+            return share
+
+        prev = None
+        for key in self.keys:
+            if prev is None:
+                # the first point also owns the arc wrapping around from the last point
+                prev = self.keys.maxes[-1] - self.total_slots
+
+            share[self.key_to_node[key]] += key - prev
+            prev = key
+
+        return {node: arc / self.total_slots for node, arc in share.items()}
+
+    def load_distribution(self) -> Dict[str, int]:
+        """ How many identifiers each node currently holds under bounded loads. """
+        return dict(self.loads)
+
+
+class MovedRange(NamedTuple):
+    """ Hashes in `[start, end)` belonged to `source` and now belong to `destination`. """
+    start: int
+    end: int
+    source: str
+    destination: str
+
+
+def ring_diff(old: ConsistentHash, new: ConsistentHash) -> List[MovedRange]:
+    """
+    Find every range of the hash space whose owner differs between two rings.
+
+    A hash h is owned by the first point strictly greater than it, so between
+    two consecutive points of *either* ring, every hash has the same owner in
+    both. Merging both rings' points into one sorted list of boundaries gives
+    us those elementary ranges, and for each one we just compare owners.
+    This is O(P log P) in the number of points, independent of the number
+    of keys.
+    """
+    if old.load_factor is not None or new.load_factor is not None:
+        raise Exception("Bounded-load placements depend on history and can't be diffed")
+
+    if old.hash_function != new.hash_function:
+        raise Exception("Rings use different hash functions")
+
+    if not old.key_to_node or not new.key_to_node:
+        raise Exception("Ring is empty")
+
+    old_points = list(old.keys)
+    new_points = list(new.keys)
+    boundaries = sorted(set(old_points) | set(new_points))
+    boundaries.append(old.total_slots)
+
+    moved: List[MovedRange] = []
+    i = j = 0
+    start = 0
+
+    for end in boundaries:
+        # the owner of [start, end) is the first point >= end, wrapping around
+        while i < len(old_points) and old_points[i] < end:
+            i += 1
+        while j < len(new_points) and new_points[j] < end:
+            j += 1
+
+        source = old.key_to_node[old_points[i % len(old_points)]]
+        destination = new.key_to_node[new_points[j % len(new_points)]]
+
+        if start < end and source != destination:
+            last = moved[-1] if moved else None
+            if last and last.end == start and (last.source, last.destination) == (source, destination):
+                # coalesce neighbouring ranges moving between the same pair of nodes
+                moved[-1] = last._replace(end=end)
+            else:
+                moved.append(MovedRange(start, end, source, destination))
+
+        start = end
+
+    return moved
+
+
+def keys_to_migrate(
+    old: ConsistentHash, new: ConsistentHash, identifiers: Iterable[str]
+) -> Iterator[Tuple[str, str, str]]:
+    """
+    Filter a stream of identifiers down to the ones that changed owner,
+    yielding `(identifier, source, destination)`. Each identifier costs one
+    hash and one binary search over the (usually short) list of moved ranges.
+    """
+    moved = ring_diff(old, new)
+    starts = [r.start for r in moved]
+
+    for identifier in identifiers:
+        h = new._hash(identifier)
+        idx = bisect(starts, h) - 1
+
+        if idx >= 0 and h < moved[idx].end:
+            yield identifier, moved[idx].source, moved[idx].destination
+
+
+class JumpHash:
+    def __init__(self, hash_function: str = "sha256") -> None:
+        self.hash_function = hash_function
+        self.hash_bytes = HASH_FUNCTIONS[hash_function]
+        self.nodes: List[str] = []
 
     def add_node(self, node: str) -> None:
-        if len(self.keys) == self.total_slots:
-            raise Exception("Ring is full")
+        if node in self.nodes:
+            raise Exception("Node already exists")
+
+        self.nodes.append(node)
+
+    def remove_node(self, node: str) -> None:
+        if node not in self.nodes:
+            raise Exception("Node does not exist")
+
+        # buckets are numbered 0..n-1, so removing any other node would
+        # renumber (and therefore move) everything after it
+        if node != self.nodes[-1]:
+            raise Exception("Jump hash can only remove the most recently added node")
 
-        key = self._hash(node)
-        idx = bisect(self.keys, key)
+        self.nodes.pop()
 
-        self.keys.insert(idx, key)
-        self.key_to_node[key] = node
+    def assign(self, identifier: str) -> str:
+        if not self.nodes:
+            raise Exception("Ring is empty")
+
+        key = self.hash_bytes(identifier.encode("utf8"))
+
+        # each iteration jumps forward to the next bucket count at which this
+        # key would move, which is a geometric-ish progression, so O(log n)
+        b, j = -1, 0
+        while j < len(self.nodes):
+            b = j
+            key = (key * 2862933555777941757 + 1) & MASK_64
+            j = int((b + 1) * ((1 << 31) / ((key >> 33) + 1)))
+
+        return self.nodes[b]
+
+
+class RendezvousHash:
+    def __init__(self, hash_function: str = "sha256") -> None:
+        self.hash_function = hash_function
+        self.hash_bytes = HASH_FUNCTIONS[hash_function]
+        # node -> (seed, 1 / weight)
+        self.nodes: Dict[str, Tuple[int, float]] = {}
+
+    def add_node(self, node: str, weight: float = 1.0) -> None:
+        if node in self.nodes:
+            raise Exception("Node already exists")
+
+        if weight <= 0:
+            raise ValueError("weight must be positive")
+
+        self.nodes[node] = (self.hash_bytes(node.encode("utf8")), 1.0 / weight)
 
     def remove_node(self, node: str) -> None:
-        key = self._hash(node)
-        # bisect_left to find the value if it exists
-        idx = bisect_left(self.keys, key)
+        if self.nodes.pop(node, None) is None:
+            raise Exception("Node does not exist")
 
-        if idx == len(self.keys) or self.keys[idx] != key:
+    def assign(self, identifier: str) -> str:
+        if not self.nodes:
+            raise Exception("Ring is empty")
+
+        key = self.hash_bytes(identifier.encode("utf8"))
+
+        # mixing the key with each node's seed gives an independent uniform
+        # u in (0, 1) per node. u ** (1 / weight) is the largest with
+        # probability proportional to weight (the same trick as weighted
+        # reservoir sampling), and is monotonic in the usual -weight / ln(u)
+        best_node = None
+        best_score = -1.0
+        for node, (seed, inverse_weight) in self.nodes.items():
+            u = (fmix64(key ^ seed) + 1) / (MASK_64 + 2)
+            score = u ** inverse_weight
+
+            if score > best_score:
+                best_node = node
+                best_score = score
+
+        return best_node
+
+
+def _is_prime(n: int) -> bool:
+    if n < 2:
+        return False
+
+    i = 2
+    while i * i <= n:
+        if n % i == 0:
+            return False
+        i += 1
+    return True
+
+
+class MaglevHash:
+    def __init__(self, table_size: int = 65537, hash_function: str = "sha256") -> None:
+        # the table size must be prime so every skip generates a full
+        # permutation: otherwise a node whose skip shares a factor with it
+        # never reaches some slots, and filling the table never finishes
+        if not _is_prime(table_size):
+            raise ValueError("table_size must be prime")
+
+        self.table_size = table_size
+        self.hash_function = hash_function
+        self.hash_bytes = HASH_FUNCTIONS[hash_function]
+        self.nodes: List[str] = []
+        # the table is rebuilt lazily on the next lookup, so a burst of
+        # membership changes only pays for one rebuild
+        self.table: Optional[List[int]] = None
+
+    def add_node(self, node: str) -> None:
+        if node in self.nodes:
+            raise Exception("Node already exists")
+
+        if len(self.nodes) == self.table_size:
+            raise Exception("Table is full")
+
+        self.nodes.append(node)
+        self.table = None
+
+    def remove_node(self, node: str) -> None:
+        if node not in self.nodes:
             raise Exception("Node does not exist")
 
-        self.keys.pop(idx)
-        del self.key_to_node[key]
+        self.nodes.remove(node)
+        self.table = None
+
+    def _populate(self) -> None:
+        m = self.table_size
+        table = [-1] * m
+
+        # node i prefers the slots offset, offset + skip, offset + 2 * skip, ...
+        offsets = []
+        skips = []
+        for node in self.nodes:
+            h = self.hash_bytes(node.encode("utf8"))
+            offsets.append(h % m)
+            skips.append(fmix64(h) % (m - 1) + 1)
+
+        nexts = [0] * len(self.nodes)
+        filled = 0
+
+        # nodes take turns claiming their next preferred free slot, so each
+        # ends up with either floor(m / n) or ceil(m / n) slots
+        while self.nodes and filled < m:
+            for i in range(len(self.nodes)):
+                slot = (offsets[i] + nexts[i] * skips[i]) % m
+                while table[slot] >= 0:
+                    nexts[i] += 1
+                    slot = (offsets[i] + nexts[i] * skips[i]) % m
+
+                table[slot] = i
+                nexts[i] += 1
+                filled += 1
+
+                if filled == m:
+                    break
+
+        self.table = table
 
     def assign(self, identifier: str) -> str:
-        key = self._hash(identifier)
-        # find the first node to the right of this key
-        # if it's at the end of the array, loop back to 0
-        idx = bisect(self.keys, key) % len(self.keys)
+        if not self.nodes:
+            raise Exception("Ring is empty")
+
+        if self.table is None:
+            self._populate()
+
+        key = self.hash_bytes(identifier.encode("utf8"))
+        return self.nodes[self.table[key % self.table_size]]
+
+
+def benchmark_assign_many(keys: List[str]) -> None:
+    from time import perf_counter
+
+    for hash_function in HASH_FUNCTIONS:
+        ring = ConsistentHash(hash_function=hash_function)
+        for i in range(300):
+            ring.add_node(f"shard-{i}")
+
+        sample = keys[:100_000]
+        start = perf_counter()
+        scalar = [ring.assign(k) for k in sample]
+        scalar_rate = len(sample) / (perf_counter() - start)
+
+        start = perf_counter()
+        batch = ring.assign_many(keys)
+        batch_rate = len(keys) / (perf_counter() - start)
+
+        assert [ring.nodes[i] for i in batch[:len(sample)]] == scalar
+        print(f"{hash_function:>8}: assign {scalar_rate:>12,.0f} keys/s, "
+              f"assign_many {batch_rate:>12,.0f} keys/s ({batch_rate / scalar_rate:.1f}x)")
+
+
+def benchmark_engines(keys: List[str], n: int = 100) -> None:
+    """
+    Compare the placement engines on lookup latency, memory, how evenly the
+    keys are spread (coefficient of variation of per-node counts) and what
+    fraction of keys move when one node is added (ideally 1 / (n + 1)).
+    """
+    import tracemalloc
+    from statistics import mean, pstdev
+    from time import perf_counter
+
+    engines = {
+        "ring": lambda: ConsistentHash(hash_function="fnv1a"),
+        "jump": lambda: JumpHash(hash_function="fnv1a"),
+        "rendezvous": lambda: RendezvousHash(hash_function="fnv1a"),
+        "maglev": lambda: MaglevHash(hash_function="fnv1a"),
+    }
+
+    print(f"{len(keys):,} keys over {n} nodes, ideal moved fraction {1 / (n + 1):.4f}")
+
+    for name, make in engines.items():
+        tracemalloc.start()
+        engine = make()
+        for i in range(n):
+            engine.add_node(f"shard-{i}")
+        engine.assign(keys[0])
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        start = perf_counter()
+        before = [engine.assign(k) for k in keys]
+        latency = (perf_counter() - start) / len(keys)
+
+        counts = {}
+        for node in before:
+            counts[node] = counts.get(node, 0) + 1
+        variation = pstdev(counts.values()) / mean(counts.values())
+
+        engine.add_node(f"shard-{n}")
+        moved = sum(a != engine.assign(k) for k, a in zip(keys, before)) / len(keys)
+
+        print(f"{name:>10}: {latency * 1e6:6.2f} us/lookup, {memory / 1024:8.1f} KiB, "
+              f"load CV {variation:.3f}, moved {moved:.4f}")
+
+
+if __name__ == "__main__":
+    keys = [f"user:{i}" for i in range(1_000_000)]
 
-        return self.key_to_node[self.keys[idx]]
+    benchmark_assign_many(keys)
+    benchmark_engines(keys[:100_000])
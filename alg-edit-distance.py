@@ -7,10 +7,49 @@
     constant (i.e. we add 1 to each operation) but it need not be. The algorithm
     is basically trying each of these operations at each step (point in the
     strings) and returning the minimum cost.
+
+    The full table takes O(mn) memory, but each row only depends on the row
+    above it, so if we only want the distance (and not the edits themselves)
+    two rows are enough. Making the rows run along the shorter string brings
+    memory down to O(min(m, n)).
+
+    Often we only care whether two strings are within some distance k of each
+    other. A path through the table that strays more than k cells from the
+    diagonal has already made more than k insertions/deletions, so only a band
+    of width 2k + 1 around the diagonal needs filling (Ukkonen), and we can
+    stop as soon as a whole row of the band is over k. That's O(k * min(m, n))
+    rather than O(mn).
+
+    Finally, with unit costs neighbouring cells differ by at most one, so a
+    column of the table can be stored as two bit vectors of +1/-1 differences,
+    and a whole column computed at once with a handful of bitwise operations
+    (Myers). Python ints are arbitrarily large, so a "machine word" here is
+    as long as the shorter string, and each operation on it runs in C.
+
+    Comparing many strings against many others (e.g. finding near duplicates)
+    is embarrassingly parallel: split the grid of pairs into blocks and hand
+    them out to a pool of processes. The strings are copied once into shared
+    memory rather than pickled along with every block. When only pairs within
+    some threshold matter, most pairs can be ruled out without a table at
+    all: every edit changes the length by at most one, and removes at most
+    one surplus letter from each side, so the distance is at least the
+    larger surplus of letter counts (which is itself at least the difference
+    in lengths).
 '''
 
+import os
+from array import array
+from collections import Counter
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from time import perf_counter
 
-def edit_distance(a, b):
+
+'''
+    The original full-table version, kept as the reference the faster
+    versions below are checked against.
+'''
+def edit_distance_table(a, b):
     table = []
 
     # build a table representing "how many edits are needed
@@ -38,6 +77,377 @@ def edit_distance(a, b):
                 insertion = table[i][j - 1]
                 replacement = table[i - 1][j - 1]
 
-                table[i][j] = 1 + min([deletion, insertion, replacement])
+                table[i][j] = 1 + min(deletion, insertion, replacement)
 
     return table[len(a)][len(b)]
+
+
+'''
+    The cost of turning a into b, where deleting a letter of a costs
+    delete_cost, inserting a letter of b costs insert_cost and replacing one
+    with the other costs replace_cost. If k is given and the distance is
+    more than k, returns None instead.
+'''
+def edit_distance(a, b, insert_cost=1, delete_cost=1, replace_cost=1, k=None):
+    if insert_cost == delete_cost == replace_cost == 1:
+        if k is None:
+            return myers_edit_distance(a, b)
+        return banded_edit_distance(a, b, k)
+
+    return two_row_edit_distance(a, b, insert_cost, delete_cost, replace_cost, k)
+
+
+def two_row_edit_distance(a, b, insert_cost=1, delete_cost=1, replace_cost=1, k=None):
+    # keep the rows along the shorter string. turning b into a is the
+    # same as turning a into b, with insertions and deletions swapped
+    if len(b) > len(a):
+        a, b = b, a
+        insert_cost, delete_cost = delete_cost, insert_cost
+
+    row = _last_row(a, b, insert_cost, delete_cost, replace_cost, k)
+    if row is None or (k is not None and row[-1] > k):
+        return None
+    return row[-1]
+
+
+def _last_row(a, b, insert_cost, delete_cost, replace_cost, k=None):
+    '''
+        The last row of the table: the cost of turning a into each prefix of b.
+        If k is given, returns None as soon as every cost in a row is over k.
+    '''
+    previous = [j * insert_cost for j in range(len(b) + 1)]
+
+    for i in range(1, len(a) + 1):
+        current = [i * delete_cost]
+
+        for j in range(1, len(b) + 1):
+            if a[i - 1] == b[j - 1]:
+                current.append(previous[j - 1])
+            else:
+                current.append(min(
+                    previous[j] + delete_cost,
+                    current[j - 1] + insert_cost,
+                    previous[j - 1] + replace_cost,
+                ))
+
+        # costs are never negative, so nothing further down can get cheaper
+        if k is not None and min(current) > k:
+            return None
+
+        previous = current
+
+    return previous
+
+
+'''
+    Unit cost edit distance if it's at most k, otherwise None.
+'''
+def banded_edit_distance(a, b, k):
+    if len(b) > len(a):
+        a, b = b, a
+
+    m, n = len(a), len(b)
+    # we need at least this many insertions just to even out the lengths
+    if m - n > k:
+        return None
+
+    # anything over k is as good as infinite, so cap everything at k + 1
+    over = k + 1
+    previous = [j if j <= k else over for j in range(n + 1)]
+    current = [over] * (n + 1)
+
+    for i in range(1, m + 1):
+        low = max(1, i - k)
+        high = min(n, i + k)
+
+        # the cell just left of the band may hold a value from two rows ago.
+        # cells right of the band have never been written to, so are still over
+        current[low - 1] = i if low == 1 else over
+        best = current[low - 1]
+
+        for j in range(low, high + 1):
+            if a[i - 1] == b[j - 1]:
+                value = previous[j - 1]
+            else:
+                value = 1 + min(previous[j], current[j - 1], previous[j - 1])
+
+            if value > over:
+                value = over
+            current[j] = value
+            if value < best:
+                best = value
+
+        if best > k:
+            return None
+
+        previous, current = current, previous
+
+    return previous[n] if previous[n] <= k else None
+
+
+'''
+    Unit cost edit distance, a column at a time (Myers 1999, in the form
+    given by Hyyro 2001). Bit i of pv/mv says whether the current column goes
+    up/down by one between rows i and i + 1; score tracks the bottom cell.
+'''
+def myers_edit_distance(a, b):
+    # the bit vectors run along the shorter string
+    if len(b) > len(a):
+        a, b = b, a
+
+    m = len(b)
+    if not m:
+        return len(a)
+
+    # for each letter, a bit mask of where it appears in b
+    peq = {}
+    for i, letter in enumerate(b):
+        peq[letter] = peq.get(letter, 0) | (1 << i)
+
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv = mask
+    mv = 0
+    score = m
+
+    for letter in a:
+        eq = peq.get(letter, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+
+        # horizontal differences (~ is negative in python, so these have
+        # stray high bits, but the masking below keeps them out of pv/mv)
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+
+        # the top row goes up by one every column, so shift in a +1
+        ph = (ph << 1) | 1
+        mh = mh << 1
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv & mask
+
+    return score
+
+
+'''
+    The cheapest way of turning a into b, as a list of
+        ('match', i, j), ('replace', i, j), ('delete', i, None) and ('insert', None, j)
+    where i and j are indices into a and b.
+
+    Recovering the edits usually means keeping the whole table to trace back
+    through. Hirschberg's trick avoids that: split a in half, and find where
+    the optimal path crosses the middle row by adding up the last row of the
+    top half's table with the last row of the bottom half's table computed
+    backwards (on both strings reversed). That crossing point splits b too,
+    leaving two independent problems of half the size. Each level of this
+    costs half as much as the one before, so it's O(mn) time overall, with
+    only O(m + n) memory.
+'''
+def edit_script(a, b, insert_cost=1, delete_cost=1, replace_cost=1):
+    script = []
+    # the ranges of a and b left to align, left-most on top
+    stack = [(0, len(a), 0, len(b))]
+
+    while stack:
+        i0, i1, j0, j1 = stack.pop()
+
+        if i0 == i1:
+            script.extend(('insert', None, j) for j in range(j0, j1))
+        elif j0 == j1:
+            script.extend(('delete', i, None) for i in range(i0, i1))
+        elif i1 - i0 == 1:
+            # a single letter: either delete it, or line it up with the
+            # cheapest letter of b and insert the rest
+            best, best_j = delete_cost + insert_cost, None
+            for j in range(j0, j1):
+                cost = 0 if a[i0] == b[j] else replace_cost
+                if cost < best:
+                    best, best_j = cost, j
+
+            if best_j is None:
+                script.append(('delete', i0, None))
+                script.extend(('insert', None, j) for j in range(j0, j1))
+            else:
+                script.extend(('insert', None, j) for j in range(j0, best_j))
+                script.append(('match' if a[i0] == b[best_j] else 'replace', i0, best_j))
+                script.extend(('insert', None, j) for j in range(best_j + 1, j1))
+        else:
+            middle = (i0 + i1) // 2
+            top = _last_row(a[i0:middle], b[j0:j1], insert_cost, delete_cost, replace_cost)
+            bottom = _last_row(a[middle:i1][::-1], b[j0:j1][::-1], insert_cost, delete_cost, replace_cost)
+
+            n = j1 - j0
+            split = min(range(n + 1), key=lambda k: top[k] + bottom[n - k])
+
+            stack.append((middle, i1, j0 + split, j1))
+            stack.append((i0, middle, j0, j0 + split))
+
+    return script
+
+'''
+    Lower bound on the unit cost edit distance, from letter counts alone.
+'''
+def histogram_bound(a, b, a_counts, b_counts):
+    surplus = 0
+    for letter, count in a_counts.items():
+        extra = count - b_counts.get(letter, 0)
+        if extra > 0:
+            surplus += extra
+
+    # a's surplus minus b's surplus is the difference in length
+    return max(surplus, surplus - len(a) + len(b))
+
+
+def _share(strings):
+    ''' Copy strings into shared memory, as offsets followed by the concatenated UTF-8. '''
+    encoded = [s.encode('utf8') for s in strings]
+    offsets = array('q', [0])
+    for e in encoded:
+        offsets.append(offsets[-1] + len(e))
+
+    header = offsets.tobytes()
+    memory = SharedMemory(create=True, size=max(1, len(header) + offsets[-1]))
+    memory.buf[:len(header)] = header
+    memory.buf[len(header):len(header) + offsets[-1]] = b''.join(encoded)
+    return memory
+
+
+# set up once in each worker process by _attach
+_shared = {}
+
+
+def _attach(query_name, query_count, target_name, target_count, threshold):
+    for key, name, count in (('queries', query_name, query_count), ('targets', target_name, target_count)):
+        memory = SharedMemory(name=name)
+        offsets = memory.buf[:8 * (count + 1)].cast('q')
+        _shared[key] = (memory, offsets, 8 * (count + 1))
+    _shared['threshold'] = threshold
+
+
+def _strings(key, start, stop):
+    memory, offsets, base = _shared[key]
+    return [
+        bytes(memory.buf[base + offsets[i]:base + offsets[i + 1]]).decode('utf8')
+        for i in range(start, stop)
+    ]
+
+
+def _pairwise_block(block):
+    q_start, q_stop, t_start, t_stop = block
+    queries = _strings('queries', q_start, q_stop)
+    targets = _strings('targets', t_start, t_stop)
+    threshold = _shared['threshold']
+    results = []
+
+    if threshold is None:
+        for i, a in enumerate(queries, q_start):
+            for j, b in enumerate(targets, t_start):
+                results.append((i, j, myers_edit_distance(a, b)))
+        return results, len(queries) * len(targets)
+
+    target_counts = [Counter(b) for b in targets]
+    for i, a in enumerate(queries, q_start):
+        a_counts = Counter(a)
+        for j, b in enumerate(targets, t_start):
+            if abs(len(a) - len(b)) > threshold:
+                continue
+            if histogram_bound(a, b, a_counts, target_counts[j - t_start]) > threshold:
+                continue
+
+            distance = banded_edit_distance(a, b, threshold)
+            if distance is not None:
+                results.append((i, j, distance))
+
+    return results, len(queries) * len(targets)
+
+
+'''
+    Yields (query index, target index, distance) for every pair of a query and
+    a target, or with a threshold, only the pairs at most that far apart.
+    Results stream back a block at a time, in whichever order blocks finish.
+    If given, progress is called after each block with the number of pairs
+    done so far and the pairs per second.
+'''
+def pairwise_edit_distance(queries, targets, threshold=None, block_size=256, processes=None, progress=None):
+    queries = list(queries)
+    targets = list(targets)
+    blocks = [
+        (q, min(q + block_size, len(queries)), t, min(t + block_size, len(targets)))
+        for q in range(0, len(queries), block_size)
+        for t in range(0, len(targets), block_size)
+    ]
+
+    query_memory = _share(queries)
+    target_memory = _share(targets)
+    try:
+        with Pool(
+            processes or os.cpu_count(),
+            initializer=_attach,
+            initargs=(query_memory.name, len(queries), target_memory.name, len(targets), threshold),
+        ) as pool:
+            start = perf_counter()
+            done = 0
+
+            for results, pairs in pool.imap_unordered(_pairwise_block, blocks):
+                yield from results
+
+                done += pairs
+                if progress:
+                    progress(done, done / max(perf_counter() - start, 1e-9))
+    finally:
+        query_memory.close()
+        query_memory.unlink()
+        target_memory.close()
+        target_memory.unlink()
+
+
+def benchmark(length=2000, k=50):
+    import random
+    import string
+
+    rng = random.Random(0)
+    a = ''.join(rng.choice(string.ascii_lowercase) for _ in range(length))
+    # a close variant of a, so the banded version doesn't exit early
+    b = list(a)
+    for _ in range(k // 3):
+        b[rng.randrange(length)] = rng.choice(string.ascii_lowercase)
+    b = ''.join(b)
+
+    for name, distance in (
+        ('table', lambda: edit_distance_table(a, b)),
+        ('two rows', lambda: two_row_edit_distance(a, b)),
+        ('banded', lambda: banded_edit_distance(a, b, k)),
+        ('myers', lambda: myers_edit_distance(a, b)),
+    ):
+        start = perf_counter()
+        result = distance()
+        print(f'{name:>8}: {result} in {(perf_counter() - start) * 1000:,.1f} ms')
+
+
+def benchmark_pairwise(n=2000, threshold=2):
+    import random
+    import string
+
+    # short words, with a near duplicate of about one in ten
+    rng = random.Random(0)
+    words = [''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 12))) for _ in range(n)]
+    for i in range(0, n, 10):
+        word = words[i]
+        j = rng.randrange(len(word))
+        words[i + 1] = word[:j] + rng.choice(string.ascii_lowercase) + word[j + 1:]
+
+    for limit in (None, threshold):
+        start = perf_counter()
+        matches = sum(1 for _ in pairwise_edit_distance(words, words, limit))
+        elapsed = perf_counter() - start
+        print(f'threshold {limit}: {n * n:,} pairs, {matches:,} results in {elapsed:.2f} s, {n * n / elapsed:,.0f} pairs/s')
+
+
+if __name__ == '__main__':
+    benchmark()
+    benchmark_pairwise()
@@ -38,9 +38,18 @@
     at all.
 '''
 
-import sys
+import os
+from array import array
+from collections import deque, namedtuple
+from heapq import heappop, heappush
+from itertools import count
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
 
-from Queue import Queue
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 class UndirectedGraph(object):
     def __init__(self):
@@ -57,43 +66,393 @@ class UndirectedGraph(object):
         return self.edges[a]
 
 
+'''
+    A dict of lists of tuples costs well over 100 bytes per edge, and every
+    step of a search chases pointers all over memory. Compressed sparse row
+    (CSR) instead numbers the nodes 0..n-1 and stores every node's
+    neighbours one after another in a single array; node i's neighbours are
+    targets[offsets[i]:offsets[i + 1]], with their weights at the same
+    positions in weights. With 32 bit targets and 64 bit weights that's
+    12 bytes per edge (each direction of an undirected edge is stored).
+
+    Node labels are interned: looked up once when the graph is built, and
+    only ids are used from then on. The arrays are saved as .npy files, so
+    loading a graph can mmap them instead of reading them in.
+'''
+class CSRGraph(object):
+    def __init__(self, labels, offsets, targets, weights, directed=False):
+        self.labels = labels
+        self.ids = {label: i for i, label in enumerate(labels)}
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        # if not, every edge is stored in both directions
+        self.directed = directed
+
+    def __len__(self):
+        return len(self.labels)
+
+    def get_edges(self, a):
+        ''' The (neighbour, weight) pairs of a label, like UndirectedGraph.get_edges. '''
+        i = self.ids[a]
+        start, stop = self.offsets[i], self.offsets[i + 1]
+        return [
+            (self.labels[neighbor], weight)
+            for neighbor, weight in zip(self.targets[start:stop].tolist(), self.weights[start:stop].tolist())
+        ]
+
+    @classmethod
+    def from_arrays(cls, labels, sources, targets, weights, directed=False):
+        ''' Build from parallel arrays of edge source ids, target ids and weights. '''
+        if not directed:
+            sources, targets = np.concatenate((sources, targets)), np.concatenate((targets, sources))
+            weights = np.concatenate((weights, weights))
+
+        # group the edges by source; stable, so each node's edges keep their order
+        order = np.argsort(sources, kind='stable')
+        offsets = np.zeros(len(labels) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(labels)), out=offsets[1:])
+
+        return cls(labels, offsets, targets[order].astype(np.int32), weights[order], directed)
+
+    @classmethod
+    def from_edges(cls, edges, directed=False, labels=()):
+        '''
+            Build from an iterable of (a, b) or (a, b, weight) edges. labels can
+            list nodes up front, so that nodes without edges are included.
+        '''
+        ids = {}
+        names = []
+
+        def intern(label):
+            i = ids.get(label)
+            if i is None:
+                i = ids[label] = len(names)
+                names.append(label)
+            return i
+
+        for label in labels:
+            intern(label)
+
+        sources = array('q')
+        targets = array('q')
+        weights = array('d')
+        integral = True
+
+        for edge in edges:
+            sources.append(intern(edge[0]))
+            targets.append(intern(edge[1]))
+
+            weight = edge[2] if len(edge) > 2 and edge[2] is not None else 1
+            integral = integral and isinstance(weight, int)
+            weights.append(weight)
+
+        # keep integer weights as integers, so they can go in a radix heap
+        weights = np.frombuffer(weights, dtype=np.float64)
+        if integral:
+            weights = weights.astype(np.int64)
+
+        return cls.from_arrays(
+            names,
+            np.frombuffer(sources, dtype=np.int64),
+            np.frombuffer(targets, dtype=np.int64),
+            weights,
+            directed,
+        )
+
+    @classmethod
+    def from_file(cls, path, directed=False, delimiter=None):
+        ''' Build from a text file with an edge "a b [weight]" per line. '''
+        def edges():
+            with open(path) as f:
+                for line in f:
+                    fields = line.split(delimiter)
+                    if len(fields) < 2 or fields[0].startswith('#'):
+                        continue
+                    if len(fields) == 2:
+                        yield fields[0], fields[1]
+                    else:
+                        yield fields[0], fields[1], _number(fields[2])
+
+        return cls.from_edges(edges(), directed)
+
+    @classmethod
+    def from_graph(cls, graph):
+        # an UndirectedGraph already lists both directions of every edge
+        csr = cls.from_edges(
+            ((a, b, weight) for a in graph.edges for b, weight in graph.get_edges(a)),
+            directed=True,
+            labels=graph.edges,
+        )
+        csr.directed = False
+        return csr
+
+    def save(self, path):
+        ''' Save to a directory of .npy files. '''
+        os.makedirs(path, exist_ok=True)
+        # an object array, so labels come back exactly as they were: np.array
+        # would turn (x, y) tuples into a 2d array, and [1, 'a'] into strings
+        labels = np.fromiter(self.labels, dtype=object, count=len(self.labels))
+
+        np.save(os.path.join(path, 'labels.npy'), labels, allow_pickle=True)
+        np.save(os.path.join(path, 'offsets.npy'), self.offsets)
+        np.save(os.path.join(path, 'targets.npy'), self.targets)
+        np.save(os.path.join(path, 'weights.npy'), self.weights)
+        np.save(os.path.join(path, 'directed.npy'), np.array(self.directed))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        mode = 'r' if mmap else None
+        # graphs saved before directed was recorded are undirected
+        directed = os.path.join(path, 'directed.npy')
+        return cls(
+            np.load(os.path.join(path, 'labels.npy'), allow_pickle=True).tolist(),
+            np.load(os.path.join(path, 'offsets.npy'), mmap_mode=mode),
+            np.load(os.path.join(path, 'targets.npy'), mmap_mode=mode),
+            np.load(os.path.join(path, 'weights.npy'), mmap_mode=mode),
+            os.path.exists(directed) and bool(np.load(directed)),
+        )
+
+
+def _number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+'''
+    A radix heap is a priority queue for when keys are non-negative integers
+    and never go below the last key popped, as in Dijkstra's algorithm with
+    integer weights. Bucket i holds keys that first differ from the last
+    popped key at bit i - 1 (bucket 0 holds keys equal to it). When bucket 0
+    is empty, the lowest non-empty bucket is emptied into lower buckets
+    relative to its smallest key, which then sits in bucket 0. Each key can
+    only move down, so that's O(log C) amortised per key for keys up to C.
+'''
+class RadixHeap(object):
+    def __init__(self):
+        self.buckets = [[]]
+        self.last = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def push(self, key, value):
+        if key < self.last:
+            raise ValueError('Keys must not be smaller than the last key popped')
+
+        i = (key ^ self.last).bit_length()
+        while len(self.buckets) <= i:
+            self.buckets.append([])
+
+        self.buckets[i].append((key, value))
+        self.size += 1
+
+    def pop(self):
+        if not self.buckets[0]:
+            i = 1
+            while not self.buckets[i]:
+                i += 1
+
+            bucket = self.buckets[i]
+            self.buckets[i] = []
+            self.last = min(key for key, _ in bucket)
+
+            for key, value in bucket:
+                self.buckets[(key ^ self.last).bit_length()].append((key, value))
+
+        self.size -= 1
+        return self.buckets[0].pop()
+
+
+'''
+    The neighbours of a node: labels for an UndirectedGraph, ids for a CSRGraph.
+    (get_edges gives (neighbour, weight) pairs, not just neighbours.)
+'''
+def _neighbors(graph):
+    if isinstance(graph, CSRGraph):
+        offsets, targets = graph.offsets, graph.targets
+        return lambda node: targets[offsets[node]:offsets[node + 1]].tolist()
+
+    return lambda node: [adjacent for adjacent, _ in graph.get_edges(node)]
+
+
 def breadth_first_search(graph, root, predicate):
-    nodes = Queue()
-    nodes.put(root)
+    neighbors = _neighbors(graph)
+    # CSR searches run on ids, but the predicate still sees labels
+    labels = graph.labels if isinstance(graph, CSRGraph) else None
+    if labels:
+        root = graph.ids[root]
+
+    # a plain deque: queue.Queue takes a lock on every put and get
+    nodes = deque([root])
     visited = set([root])
 
-    while nodes.qsize() > 0:
-        node = nodes.get()
+    while nodes:
+        node = nodes.popleft()
+        label = labels[node] if labels else node
 
-        if predicate(node):
-            return node
+        if predicate(label):
+            return label
 
-        for adjacent in graph.get_edges(node):
+        for adjacent in neighbors(node):
             if adjacent not in visited:
-                nodes.put(adjacent)
+                nodes.append(adjacent)
                 visited.add(adjacent)
 
     return None
 
 
 def depth_first_search(graph, root, predicate):
+    neighbors = _neighbors(graph)
+    labels = graph.labels if isinstance(graph, CSRGraph) else None
+    if labels:
+        root = graph.ids[root]
+
     nodes = [root]
     visited = set()
 
     while nodes:
         node = nodes.pop()
         visited.add(node)
+        label = labels[node] if labels else node
 
-        if predicate(node):
-            return node
+        if predicate(label):
+            return label
 
-        for adjacent in graph.get_edges(node):
+        for adjacent in neighbors(node):
             if adjacent not in visited:
                 nodes.append(adjacent)
 
     return None
 
 
+'''
+    BFS visits nodes a level at a time, so rather than one node at a time we
+    can expand a whole frontier at once with array operations on a CSRGraph:
+    gather the neighbours of every frontier node, drop those already
+    reached, and keep one copy of each as the next frontier. distance
+    doubles as the visited set (-1 for unreached).
+
+    Late in a search, the frontier may be most of the graph while few nodes
+    are left unreached. Then it's cheaper to go bottom-up: have each
+    unreached node look for a neighbour in the frontier instead. (This needs
+    incoming edges, which in an undirected graph are the same as outgoing.
+    A directed CSRGraph only stores outgoing edges, so it's always searched
+    top-down.) Direction-optimizing BFS (Beamer et al.) switches between the
+    two each level; here we just pick whichever has fewer edges to gather.
+
+    Starting from several sources at once finds each node's distance to the
+    nearest of them. With processes, top-down steps split the frontier
+    among a pool, which reads distance from shared memory.
+'''
+def frontier_bfs(graph, sources, direction_optimizing=True, processes=None):
+    ''' Returns (distance, parent) arrays over graph's ids, -1 where unreached (and for the sources' parents). '''
+    n = len(graph)
+    offsets, targets = graph.offsets, graph.targets
+    degrees = np.diff(offsets)
+    direction_optimizing = direction_optimizing and not graph.directed
+
+    memory = SharedMemory(create=True, size=max(1, 4 * n))
+    distance = np.ndarray(n, dtype=np.int32, buffer=memory.buf)
+    distance[:] = -1
+    parent = np.full(n, -1, dtype=np.int32)
+
+    frontier = np.unique(np.array([graph.ids[source] for source in sources], dtype=np.int64))
+    distance[frontier] = 0
+    unreached_edges = int(degrees.sum() - degrees[frontier].sum())
+
+    pool = None
+    if processes:
+        pool = Pool(processes, initializer=_bfs_attach, initargs=(graph, memory.name, n))
+
+    try:
+        level = 0
+        while len(frontier):
+            level += 1
+
+            if direction_optimizing and unreached_edges < degrees[frontier].sum():
+                reached, parents = _bottom_up(offsets, targets, distance, frontier)
+            elif pool:
+                chunks = np.array_split(frontier, processes)
+                found = pool.map(_bfs_expand, [chunk for chunk in chunks if len(chunk)])
+                reached, parents = _first_of_each(
+                    np.concatenate([r for r, _ in found]),
+                    np.concatenate([p for _, p in found]),
+                )
+            else:
+                reached, parents = _top_down(offsets, targets, distance, frontier)
+
+            distance[reached] = level
+            parent[reached] = parents
+            unreached_edges -= int(degrees[reached].sum())
+            frontier = reached
+
+        return distance.copy(), parent
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        del distance
+        memory.close()
+        memory.unlink()
+
+
+def _gather(offsets, targets, nodes):
+    ''' Every edge out of nodes, as (node, neighbour) arrays. '''
+    starts = offsets[nodes]
+    counts = offsets[nodes + 1] - starts
+    total = int(counts.sum())
+
+    # position of each edge in targets: its node's start, plus how far
+    # along that node's edges it is
+    ends = np.cumsum(counts)
+    edges = np.arange(total) + np.repeat(starts - (ends - counts), counts)
+    return np.repeat(nodes, counts), targets[edges]
+
+
+def _first_of_each(nodes, parents):
+    ''' Each distinct node once, with the parent it first appeared with. '''
+    nodes, first = np.unique(nodes, return_index=True)
+    return nodes, parents[first]
+
+
+def _top_down(offsets, targets, distance, frontier):
+    parents, neighbors = _gather(offsets, targets, frontier)
+    new = distance[neighbors] == -1
+    return _first_of_each(neighbors[new], parents[new])
+
+
+def _bottom_up(offsets, targets, distance, frontier):
+    in_frontier = np.zeros(len(distance), dtype=bool)
+    in_frontier[frontier] = True
+
+    unreached = np.flatnonzero(distance == -1)
+    nodes, neighbors = _gather(offsets, targets, unreached)
+    hit = in_frontier[neighbors]
+    return _first_of_each(nodes[hit], neighbors[hit])
+
+
+# the graph and shared distance array, in each worker process
+_bfs_shared = {}
+
+
+def _bfs_attach(graph, name, n):
+    memory = SharedMemory(name=name)
+    _bfs_shared.update(
+        graph=graph,
+        memory=memory,
+        distance=np.ndarray(n, dtype=np.int32, buffer=memory.buf),
+    )
+
+
+def _bfs_expand(frontier):
+    graph = _bfs_shared['graph']
+    return _top_down(graph.offsets, graph.targets, _bfs_shared['distance'], frontier)
+
+
 '''
     Dijkstra's algorithm is a fairly intuitive graph search algorithm to compute
     single-source shortest path (all shortest paths from a root). We basically have
@@ -104,30 +463,447 @@ def depth_first_search(graph, root, predicate):
     weight is the key to making this work, since we know (assuming non-negative weights)
     that minimum weight is the final shortest weight to that node.
 
-    This algorithm runs in O( E + V^2 ) time, and since E = O(V^2) generally just
-    O(V^2). If we use a min heap for finding the minimum weight, we can take this
-    down to O( E + V log V ).
+    Scanning for the minimum each time makes this O(V^2). With a binary heap
+    it's O((E + V) log V). Heaps can't cheaply lower a key that's already in
+    them, so instead we push the node again with its new weight and skip the
+    stale entries when they're popped ("lazy deletion").
+
+    If we only want the path to one target, we can stop as soon as it's popped.
+    The result then only has the nodes settled by that point: the weights of
+    the others are only upper bounds so far. Remembering which node each
+    shortest weight came from lets us walk the path back from the target.
+
+    Edges without a weight count as 1. Nodes that can't be reached from the
+    root are left out of the result.
 '''
-def dijkstras_algorithm(graph, root):
-    nodes = set(graph.edges.keys())
+def dijkstras_algorithm(graph, root, target=None, radix=False, predecessors=False):
+    if isinstance(graph, CSRGraph):
+        shortest, previous = _dijkstras_csr(graph, root, target, radix)
+    else:
+        shortest, previous = _dijkstras_edges(graph, root, target, radix)
+
+    if predecessors:
+        return shortest, previous
+    return shortest
+
+
+def _heap(radix):
+    ''' push(weight, node) and pop() -> (weight, node) for a binary or radix heap. '''
+    if radix:
+        heap = RadixHeap()
+        return heap, heap.push, heap.pop
+
+    heap = []
+    # the counter breaks ties, so the nodes themselves are never compared
+    order = count()
+    return (
+        heap,
+        lambda weight, node: heappush(heap, (weight, next(order), node)),
+        lambda: heappop(heap)[::2],
+    )
+
+
+def _dijkstras_edges(graph, root, target, radix):
     shortest = { root: 0 }
+    previous = { root: None }
+    done = set()
 
-    while nodes:
-        min_node = None
-        min_weight = None
+    heap, push, pop = _heap(radix)
+    push(0, root)
+
+    while heap:
+        min_weight, min_node = pop()
 
-        for node in shortest:
-            if node in nodes and (not min_weight or shortest[node] < min_weight):
-                min_node = node
-                min_weight = shortest[node]
+        # a stale entry, from before we found a shorter way here
+        if min_node in done:
+            continue
+        done.add(min_node)
 
-        nodes.remove(min_node)
+        if min_node == target:
+            # the rest only have upper bounds so far
+            shortest = { node: shortest[node] for node in done }
+            previous = { node: previous[node] for node in done }
+            break
 
         for neighbor, weight in graph.get_edges(min_node):
-            if neighbor not in shortest or shortest[neighbor] > min_weight + weight:
-                shortest[neighbor] = min_weight + weight
+            candidate = min_weight + (1 if weight is None else weight)
+            if neighbor not in shortest or candidate < shortest[neighbor]:
+                shortest[neighbor] = candidate
+                previous[neighbor] = min_node
+                push(candidate, neighbor)
+
+    return shortest, previous
+
+
+def _dijkstras_csr(graph, root, target, radix):
+    start = graph.ids[root]
+    stop = graph.ids[target] if target is not None else -1
+    shortest, previous = _dijkstras_ids(graph, start, stop, radix)
+
+    infinity = float('inf')
+    labels = graph.labels
+    return (
+        { labels[i]: weight for i, weight in enumerate(shortest) if weight != infinity },
+        { labels[i]: labels[p] if p >= 0 else None for i, p in enumerate(previous) if shortest[i] != infinity },
+    )
+
+
+def _dijkstras_ids(graph, start, stop, radix, offsets=None):
+    ''' Dijkstra over a CSRGraph's ids, returning lists of weights (inf if unreachable) and predecessors (-1). '''
+    if offsets is None:
+        offsets = graph.offsets.tolist()
+    targets, weights = graph.targets, graph.weights
+    infinity = float('inf')
+
+    shortest = [infinity] * len(graph)
+    previous = [-1] * len(graph)
+    done = bytearray(len(graph))
+    shortest[start] = 0
+
+    heap, push, pop = _heap(radix)
+    push(0, start)
+
+    while heap:
+        min_weight, min_node = pop()
+
+        if done[min_node]:
+            continue
+        done[min_node] = 1
+
+        if min_node == stop:
+            # the rest only have upper bounds so far
+            for node in range(len(graph)):
+                if not done[node]:
+                    shortest[node] = infinity
+                    previous[node] = -1
+            break
+
+        first, last = offsets[min_node], offsets[min_node + 1]
+        for neighbor, weight in zip(targets[first:last].tolist(), weights[first:last].tolist()):
+            candidate = min_weight + weight
+            if candidate < shortest[neighbor]:
+                shortest[neighbor] = candidate
+                previous[neighbor] = min_node
+                push(candidate, neighbor)
+
+    return shortest, previous
+
+
+'''
+    The weight of the shortest path from root to target and the path itself,
+    or None if target can't be reached.
+'''
+def shortest_path(graph, root, target, radix=False):
+    shortest, previous = dijkstras_algorithm(graph, root, target, radix, predecessors=True)
+    if target not in shortest:
+        return None
+
+    path = [target]
+    while previous[path[-1]] is not None:
+        path.append(previous[path[-1]])
+    path.reverse()
+
+    return shortest[target], path
+
+
+'''
+    Point-to-point searches. Searching from the root until the target comes up
+    settles every node closer than the target: on a road network, a whole
+    disc around the root. Searching from both ends at once and stopping when
+    they meet settles two discs of half the radius, roughly half as many
+    nodes (and far fewer in graphs that branch out quickly).
+
+    A* instead steers one search toward the target: it orders nodes by
+    distance so far plus a heuristic estimate of the distance left. If the
+    estimate never overestimates (and never drops by more than an edge's
+    weight along it), the first time the target is popped is still the
+    shortest path, and the better the estimate the fewer nodes are settled.
+    With no heuristic, A* is just Dijkstra's algorithm with an early exit.
+
+    Landmarks (ALT) give a good heuristic for any graph: precompute the
+    distances from a few landmarks to every node. By the triangle inequality,
+    d(v, t) >= |d(L, t) - d(L, v)| for every landmark L, so the largest of
+    those is an admissible estimate. Landmarks far out on the edge of the
+    graph work best, so each one is picked as the node furthest from the
+    ones chosen so far.
+
+    Every search takes (graph, root, target) and returns a SearchResult with
+    the distance (None if the target can't be reached), the path, and the
+    number of nodes settled. These assume an undirected graph, so that the
+    backward searches can use the same edges.
+'''
+SearchResult = namedtuple('SearchResult', ['distance', 'path', 'settled'])
+
+
+def _search_space(graph):
+    ''' (label -> node, node -> [(neighbour, weight)], node -> label) for either kind of graph. '''
+    if isinstance(graph, CSRGraph):
+        offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+
+        def neighbors(node):
+            first, last = offsets[node:node + 2].tolist()
+            return zip(targets[first:last].tolist(), weights[first:last].tolist())
+
+        return graph.ids.__getitem__, neighbors, graph.labels.__getitem__
+
+    def neighbors(node):
+        return [(adjacent, 1 if weight is None else weight) for adjacent, weight in graph.get_edges(node)]
+
+    same = lambda node: node
+    return same, neighbors, same
+
+
+def _walk_back(parents, node):
+    path = [node]
+    while parents[path[-1]] is not None:
+        path.append(parents[path[-1]])
+    return path
+
+
+def bfs_search(graph, root, target):
+    ''' The fewest hops from root to target, ignoring weights. '''
+    to_node, neighbors, to_label = _search_space(graph)
+    root, target = to_node(root), to_node(target)
+
+    parents = { root: None }
+    frontier = [root]
+
+    while frontier and target not in parents:
+        next_frontier = []
+        for node in frontier:
+            for adjacent, _ in neighbors(node):
+                if adjacent not in parents:
+                    parents[adjacent] = node
+                    next_frontier.append(adjacent)
+        frontier = next_frontier
+
+    if target not in parents:
+        return SearchResult(None, None, len(parents))
+
+    path = _walk_back(parents, target)
+    path.reverse()
+    return SearchResult(len(path) - 1, [to_label(node) for node in path], len(parents))
+
+
+def bidirectional_bfs(graph, root, target):
+    to_node, neighbors, to_label = _search_space(graph)
+    root, target = to_node(root), to_node(target)
+
+    if root == target:
+        return SearchResult(0, [to_label(root)], 1)
+
+    forward = { root: None }
+    backward = { target: None }
+    # how many hops each node visited so far is from its side's start
+    forward_depth = { root: 0 }
+    backward_depth = { target: 0 }
+    forward_frontier = [root]
+    backward_frontier = [target]
+    best = None
+
+    while forward_frontier and backward_frontier and best is None:
+        # grow whichever side has the smaller frontier, a whole level at a time
+        if len(forward_frontier) <= len(backward_frontier):
+            parents, depth, frontier = forward, forward_depth, forward_frontier
+            other, other_depth = backward, backward_depth
+        else:
+            parents, depth, frontier = backward, backward_depth, backward_frontier
+            other, other_depth = forward, forward_depth
+
+        next_frontier = []
+        for node in frontier:
+            for adjacent, _ in neighbors(node):
+                if adjacent in other:
+                    # finish the level: a later meeting may still be shorter
+                    length = depth[node] + 1 + other_depth[adjacent]
+                    if best is None or length < best[0]:
+                        best = (length, node, adjacent)
+
+                if adjacent not in parents:
+                    parents[adjacent] = node
+                    depth[adjacent] = depth[node] + 1
+                    next_frontier.append(adjacent)
+
+        if parents is forward:
+            forward_frontier = next_frontier
+        else:
+            backward_frontier = next_frontier
+
+    settled = len(forward) + len(backward)
+    if best is None:
+        return SearchResult(None, None, settled)
+
+    length, node, adjacent = best
+    if parents is backward:
+        node, adjacent = adjacent, node
+
+    # node is on the forward side, adjacent on the backward side
+    path = _walk_back(forward, node)
+    path.reverse()
+    path.extend(_walk_back(backward, adjacent))
+    return SearchResult(length, [to_label(n) for n in path], settled)
+
+
+def a_star(graph, root, target, heuristic=None):
+    ''' heuristic(label) estimates the distance from a node to target; None makes this Dijkstra. '''
+    to_node, neighbors, to_label = _search_space(graph)
+    root, target = to_node(root), to_node(target)
+    estimate = (lambda node: heuristic(to_label(node))) if heuristic else (lambda node: 0)
+
+    shortest = { root: 0 }
+    parents = { root: None }
+    done = set()
+    order = count()
+    heap = [(estimate(root), next(order), root)]
+
+    while heap:
+        _, _, node = heappop(heap)
+        if node in done:
+            continue
+        done.add(node)
+
+        if node == target:
+            path = _walk_back(parents, target)
+            path.reverse()
+            return SearchResult(shortest[target], [to_label(n) for n in path], len(done))
+
+        for adjacent, weight in neighbors(node):
+            candidate = shortest[node] + weight
+            if adjacent not in shortest or candidate < shortest[adjacent]:
+                shortest[adjacent] = candidate
+                parents[adjacent] = node
+                heappush(heap, (candidate + estimate(adjacent), next(order), adjacent))
+
+    return SearchResult(None, None, len(done))
+
+
+def dijkstra_search(graph, root, target):
+    return a_star(graph, root, target)
+
+
+def bidirectional_dijkstra(graph, root, target):
+    to_node, neighbors, to_label = _search_space(graph)
+    root, target = to_node(root), to_node(target)
+
+    if root == target:
+        return SearchResult(0, [to_label(root)], 1)
+
+    # index 0 searches forward from the root, 1 backward from the target
+    shortest = ({ root: 0 }, { target: 0 })
+    parents = ({ root: None }, { target: None })
+    done = (set(), set())
+    order = count()
+    heaps = ([(0, next(order), root)], [(0, next(order), target)])
+
+    best = float('inf')
+    meeting = None
+
+    while heaps[0] and heaps[1]:
+        # once the two smallest keys add up to the best path seen, any
+        # path through nodes not yet settled can't be shorter
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+
+        side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+        weight_so_far, _, node = heappop(heaps[side])
+        if node in done[side]:
+            continue
+        done[side].add(node)
+
+        for adjacent, weight in neighbors(node):
+            candidate = weight_so_far + weight
+            if adjacent not in shortest[side] or candidate < shortest[side][adjacent]:
+                shortest[side][adjacent] = candidate
+                parents[side][adjacent] = node
+                heappush(heaps[side], (candidate, next(order), adjacent))
+
+            if adjacent in shortest[1 - side]:
+                length = candidate + shortest[1 - side][adjacent]
+                if length < best:
+                    best = length
+                    # the edge joining the forward half to the backward half
+                    meeting = (node, adjacent) if side == 0 else (adjacent, node)
+
+    settled = len(done[0]) + len(done[1])
+    if meeting is None:
+        return SearchResult(None, None, settled)
+
+    path = _walk_back(parents[0], meeting[0])
+    path.reverse()
+    path.extend(_walk_back(parents[1], meeting[1]))
+    return SearchResult(best, [to_label(n) for n in path], settled)
+
+
+class Landmarks(object):
+    def __init__(self, graph, count=8, seed=0):
+        import random
+
+        to_node, _, to_label = _search_space(graph)
+        self.to_node = to_node
+        self.distances = []
+
+        # start from a random node, then keep adding whichever node is
+        # furthest from all the landmarks so far
+        labels = graph.labels if isinstance(graph, CSRGraph) else list(graph.edges)
+        landmark = to_node(random.Random(seed).choice(labels))
+        nearest = None
+        self.landmarks = []
+
+        for _ in range(count):
+            self.landmarks.append(to_label(landmark))
+            distances = self._distances_from(graph, landmark)
+            self.distances.append(distances)
+
+            pairs = enumerate(distances) if isinstance(distances, list) else distances.items()
+            if nearest is None:
+                nearest = dict(pairs)
+            else:
+                for node, distance in pairs:
+                    if distance < nearest[node]:
+                        nearest[node] = distance
+
+            # ignore anything unreachable, it's no use as a landmark
+            landmark = max(
+                (node for node, distance in nearest.items() if distance != float('inf')),
+                key=nearest.__getitem__,
+            )
+
+    @staticmethod
+    def _distances_from(graph, node):
+        if isinstance(graph, CSRGraph):
+            return _dijkstras_ids(graph, node, -1, False)[0]
+        return dijkstras_algorithm(graph, node)
+
+    def heuristic(self, target):
+        ''' An admissible estimate of the distance from a label to target. '''
+        to_node = self.to_node
+        target = to_node(target)
+        infinity = float('inf')
+
+        # a landmark that can't reach the target tells us nothing. one that can
+        # reach the target but not a node means the node can't reach it either
+        if self.distances and isinstance(self.distances[0], list):
+            tables = [(d, d[target]) for d in self.distances if d[target] != infinity]
+            lookup = list.__getitem__
+        else:
+            tables = [(d, d[target]) for d in self.distances if target in d]
+            lookup = lambda d, node: d.get(node, infinity)
+
+        def estimate(label):
+            node = to_node(label)
+            return max([abs(to_target - lookup(d, node)) for d, to_target in tables], default=0)
+
+        return estimate
+
+
+SEARCHES = {
+    'bfs': bfs_search,
+    'bidirectional-bfs': bidirectional_bfs,
+    'dijkstra': dijkstra_search,
+    'bidirectional-dijkstra': bidirectional_dijkstra,
+    'a-star': a_star,
+}
 
-    return shortest
 
 '''
     The Floyd-Warshall algorithm for solving the all-pairs shortest path problem works
@@ -136,31 +912,498 @@ def dijkstras_algorithm(graph, root):
     nodes. If a path going from i to k then k to j is faster than the previously best seen
     path going from i to j, then update its distance.
 
-    It runs in O(V^3) time.
+    It runs in O(V^3) time. But for each k, the update of every (i, j) pair is
+    independent, so on a distance matrix it's a single vectorised operation:
+    the minimum of the matrix and column k plus row k. Row and column k can't
+    change during step k (going through k to get to k doesn't help), so this
+    can be done in place.
+
+    A predecessor matrix remembers the node before j on the best path from i
+    to j, so paths can be recovered: when going through k is better, the node
+    before j is whatever it is on the path from k to j.
 '''
 def floyd_warshall_algorithm(graph):
-    nodes = set(graph.edges.keys())
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_graph(graph)
+
+    labels, distances = all_pairs_shortest_paths(graph)
+    # keep integer weights as integers
+    integral = graph.weights.dtype.kind == 'i'
+
+    result = {}
+    for label, row in zip(labels, distances.tolist()):
+        result[label] = {
+            labels[j]: int(weight) if integral else weight
+            for j, weight in enumerate(row) if weight != float('inf')
+        }
+
+    return result
+
+
+'''
+    Shortest paths between every pair of nodes, as (labels, distance matrix),
+    plus a predecessor matrix if asked for (-1 where there's no predecessor).
+
+        'floyd-warshall'  one vectorised step per k, best up to a couple of thousand nodes
+        'blocked'         Floyd-Warshall on one block of rows at a time, see below
+        'johnson'         Dijkstra from every node, run across processes, for sparse graphs
+'''
+def all_pairs_shortest_paths(graph, method='floyd-warshall', predecessors=False, block_size=64, processes=None):
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_graph(graph)
+
+    if method == 'johnson':
+        distances, previous = _johnson(graph, processes)
+    else:
+        distances, previous = _adjacency_matrix(graph, predecessors)
+        if method == 'blocked':
+            _floyd_warshall_blocked(distances, previous, block_size)
+        elif method == 'floyd-warshall':
+            _floyd_warshall(distances, previous)
+        else:
+            raise ValueError('Unknown method %r' % method)
+
+    if predecessors:
+        return graph.labels, distances, previous
+    return graph.labels, distances
+
+
+def _adjacency_matrix(graph, predecessors):
+    n = len(graph)
+    sources = np.repeat(np.arange(n), np.diff(graph.offsets))
+
+    distances = np.full((n, n), np.inf)
+    # the cheapest of any parallel edges
+    np.minimum.at(distances, (sources, graph.targets), graph.weights)
+    np.fill_diagonal(distances, 0)
+
+    previous = None
+    if predecessors:
+        previous = np.full((n, n), -1, dtype=np.int32)
+        previous[sources, graph.targets] = sources
+        np.fill_diagonal(previous, -1)
+
+    return distances, previous
+
+
+def _relax(distances, previous, rows, k):
+    ''' Step k of Floyd-Warshall on some rows of the matrix, in place. '''
+    candidate = distances[rows, k, None] + distances[k]
+
+    if previous is None:
+        np.minimum(distances[rows], candidate, out=distances[rows])
+    else:
+        better = candidate < distances[rows]
+        np.copyto(distances[rows], candidate, where=better)
+        np.copyto(previous[rows], previous[k], where=better)
+
+
+def _floyd_warshall(distances, previous):
+    rows = slice(None)
+    for k in range(len(distances)):
+        _relax(distances, previous, rows, k)
+
+
+'''
+    Each step of the plain version streams the whole matrix through memory,
+    which for a few thousand nodes is far bigger than the CPU cache. Instead,
+    take the steps for k in one block of size b at a time, and apply all b of
+    them to one block of b rows before moving on to the next, so those rows
+    stay in cache. The rows in block k have to go first: every other row
+    reads them, and must see them updated by the earlier ks in the block.
+    (Seeing them updated by later ones too does no harm, entries only ever
+    go down to lengths of real paths.)
+'''
+def _floyd_warshall_blocked(distances, previous, block_size):
+    n = len(distances)
+
+    for k_start in range(0, n, block_size):
+        ks = range(k_start, min(k_start + block_size, n))
+        starts = [k_start] + [i for i in range(0, n, block_size) if i != k_start]
+
+        for i in starts:
+            rows = slice(i, i + block_size)
+            for k in ks:
+                _relax(distances, previous, rows, k)
+
+
+'''
+    Johnson's algorithm runs Dijkstra from every node, which for sparse graphs
+    is O(V E log V) rather than O(V^3). Dijkstra needs non-negative weights,
+    so first find a potential h for each node with Bellman-Ford (the shortest
+    distance from an extra node joined to every node with weight 0), then
+    reweight each edge u -> v to w + h[u] - h[v], which is never negative and
+    changes every path from a to b by the same h[a] - h[b]. The searches from
+    different nodes are independent, so they're shared out among processes.
+'''
+def _johnson(graph, processes):
+    n = len(graph)
+    sources = np.repeat(np.arange(n), np.diff(graph.offsets))
+    targets = graph.targets.astype(np.int64)
+
+    # Bellman-Ford from the extra node, one vectorised pass over every edge per round
+    potential = np.zeros(n)
+    for _ in range(n + 1):
+        candidate = potential[sources] + graph.weights
+        updated = potential.copy()
+        np.minimum.at(updated, targets, candidate)
+        if np.array_equal(updated, potential):
+            break
+        potential = updated
+    else:
+        raise ValueError('Graph has a negative cycle')
+
+    reweighted = CSRGraph(
+        graph.labels,
+        graph.offsets,
+        graph.targets,
+        graph.weights + potential[sources] - potential[targets],
+        graph.directed,
+    )
+
+    distances = np.empty((n, n))
+    previous = np.empty((n, n), dtype=np.int32)
+    chunks = [range(i, min(i + 64, n)) for i in range(0, n, 64)]
+
+    with Pool(processes or os.cpu_count(), initializer=_johnson_attach, initargs=(reweighted,)) as pool:
+        for rows in pool.imap_unordered(_johnson_rows, chunks):
+            for i, shortest, before in rows:
+                # undo the reweighting
+                distances[i] = np.asarray(shortest) - potential[i] + potential
+                previous[i] = before
+
+    return distances, previous
+
+
+# the reweighted graph, in each worker process
+_johnson_graph = []
+
+
+def _johnson_attach(graph):
+    _johnson_graph.append(graph)
+
+
+def _johnson_rows(sources):
+    graph = _johnson_graph[0]
+    offsets = graph.offsets.tolist()
+    return [(i,) + _dijkstras_ids(graph, i, -1, False, offsets) for i in sources]
+
+
+'''
+    The path from i to j (as ids) from a predecessor matrix, or None if there isn't one.
+'''
+def matrix_path(previous, i, j):
+    if i != j and previous[i, j] < 0:
+        return None
+
+    path = [j]
+    while path[-1] != i:
+        path.append(int(previous[i, path[-1]]))
+    path.reverse()
+
+    return path
+
+
+
+'''
+    Union-find (disjoint sets) tracks connected components as edges stream in.
+    Each node points at a parent in its component, and the root of that tree
+    names the component. Joining two components just points one root at the
+    other: the root of the shorter tree (by rank, an upper bound on height)
+    under the taller one, so trees stay shallow. Finding a root also points
+    the nodes along the way closer to it (path halving), so later finds are
+    quicker. Together that's O(a(n)) per operation, where a is the inverse
+    Ackermann function: effectively constant.
+
+    Everything lives in arrays indexed by an interned id. Each component's
+    members are also threaded into a circular linked list (next), and two
+    circles merge by swapping a single pair of pointers, so listing a
+    component never needs a scan of all the nodes.
+'''
+class UnionFind(object):
+    def __init__(self, labels=()):
+        self.ids = {}
+        self.labels = []
+        self.parents = array('q')
+        self.ranks = array('B')
+        self.sizes = array('q')
+        self.next = array('q')
+        self.components = 0
+
+        for label in labels:
+            self.add(label)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, label):
+        return label in self.ids
+
+    def add(self, label):
+        i = self.ids.get(label)
+        if i is None:
+            i = self.ids[label] = len(self.labels)
+            self.labels.append(label)
+            self.parents.append(i)
+            self.ranks.append(0)
+            self.sizes.append(1)
+            self.next.append(i)
+            self.components += 1
+        return i
+
+    def _root(self, i):
+        parents = self.parents
+        while parents[i] != i:
+            # point at the grandparent, halving the path as we go
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+
+    def find(self, label):
+        ''' The label naming label's component. '''
+        return self.labels[self._root(self.ids[label])]
+
+    def union(self, a, b):
+        ''' Join the components of a and b (adding them if new). False if they were already joined. '''
+        a, b = self._root(self.add(a)), self._root(self.add(b))
+        if a == b:
+            return False
+
+        if self.ranks[a] < self.ranks[b]:
+            a, b = b, a
+        elif self.ranks[a] == self.ranks[b]:
+            self.ranks[a] += 1
+
+        self.parents[b] = a
+        self.sizes[a] += self.sizes[b]
+        self.next[a], self.next[b] = self.next[b], self.next[a]
+        self.components -= 1
+        return True
+
+    add_edge = union
+
+    def connected(self, a, b):
+        return self._root(self.ids[a]) == self._root(self.ids[b])
+
+    def size(self, label):
+        return self.sizes[self._root(self.ids[label])]
+
+    def members(self, label):
+        start = self.ids[label]
+        result = [self.labels[start]]
+        i = self.next[start]
+        while i != start:
+            result.append(self.labels[i])
+            i = self.next[i]
+        return result
+
+
+def _all_nodes(graph):
+    return graph.labels if isinstance(graph, CSRGraph) else list(graph.edges)
+
+
+'''
+    Strongly connected components (Tarjan): number nodes in DFS order, and
+    track the lowest number reachable from each node's subtree through nodes
+    still on the stack. A node whose lowest is its own number is the first
+    node of a component, which is everything above it on the stack.
+
+    The recursion is replaced with an explicit stack of (node, remaining
+    neighbours), so there's no recursion limit. Components come out in
+    reverse topological order. For a CSRGraph, build it with directed=True.
+'''
+def strongly_connected_components(graph):
+    to_node, neighbors, to_label = _search_space(graph)
+    number = {}
+    lowest = {}
+    stack = []
+    on_stack = set()
+    components = []
+    counter = count()
+
+    for start in _all_nodes(graph):
+        start = to_node(start)
+        if start in number:
+            continue
+
+        number[start] = lowest[start] = next(counter)
+        stack.append(start)
+        on_stack.add(start)
+        work = [(start, iter(neighbors(start)))]
+
+        while work:
+            node, remaining = work[-1]
+
+            for adjacent, _ in remaining:
+                if adjacent not in number:
+                    number[adjacent] = lowest[adjacent] = next(counter)
+                    stack.append(adjacent)
+                    on_stack.add(adjacent)
+                    work.append((adjacent, iter(neighbors(adjacent))))
+                    break
+                elif adjacent in on_stack and number[adjacent] < lowest[node]:
+                    lowest[node] = number[adjacent]
+            else:
+                # every neighbour is done: return to the parent
+                work.pop()
+                if work and lowest[node] < lowest[work[-1][0]]:
+                    lowest[work[-1][0]] = lowest[node]
+
+                if lowest[node] == number[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.remove(member)
+                        component.append(to_label(member))
+                        if member == node:
+                            break
+                    components.append(component)
+
+    return components
+
+
+'''
+    A cycle in the graph as a list of nodes (each joined to the next, and the
+    last to the first), or None if there isn't one. This is the DFS back edge
+    search described at the top of this file: an edge to a node still on the
+    current path closes a cycle, which we read off by following parents back.
+
+    In an undirected graph the edge back to a node's parent doesn't count
+    (though a second, parallel edge to it does). UnionFind.union returning
+    False is the streaming equivalent for undirected graphs.
+'''
+def find_cycle(graph, directed=False):
+    to_node, neighbors, to_label = _search_space(graph)
+    # 1 while a node is on the current path, 2 once it's finished
+    state = {}
+    parents = {}
+
+    for start in _all_nodes(graph):
+        start = to_node(start)
+        if start in state:
+            continue
+
+        state[start] = 1
+        parents[start] = None
+        # (node, remaining neighbours, whether the edge to the parent is still to skip)
+        work = [[start, iter(neighbors(start)), not directed]]
+
+        while work:
+            frame = work[-1]
+            node, remaining = frame[0], frame[1]
+
+            for adjacent, _ in remaining:
+                if frame[2] and adjacent == parents[node]:
+                    frame[2] = False
+                    continue
+
+                seen = state.get(adjacent)
+                if seen is None:
+                    state[adjacent] = 1
+                    parents[adjacent] = node
+                    work.append([adjacent, iter(neighbors(adjacent)), not directed])
+                    break
+
+                if seen == 1:
+                    cycle = [node]
+                    while cycle[-1] != adjacent:
+                        cycle.append(parents[cycle[-1]])
+                    cycle.reverse()
+                    return [to_label(n) for n in cycle]
+            else:
+                state[node] = 2
+                work.pop()
+
+    return None
+
+def grid_graph(width, height, seed=0):
+    ''' A road-like grid, with random weights of 1 to 10 between neighbouring (x, y) cells. '''
+    import random
+
+    rng = random.Random(seed)
+    edges = []
+    for x in range(width):
+        for y in range(height):
+            if x + 1 < width:
+                edges.append(((x, y), (x + 1, y), rng.randint(1, 10)))
+            if y + 1 < height:
+                edges.append(((x, y), (x, y + 1), rng.randint(1, 10)))
+
+    return CSRGraph.from_edges(edges)
+
+
+def benchmark_searches(width=300, queries=20, landmarks=16):
+    import random
+    from time import perf_counter
+
+    graph = grid_graph(width, width)
+    alt = Landmarks(graph, landmarks)
+
+    rng = random.Random(1)
+    pairs = [(rng.choice(graph.labels), rng.choice(graph.labels)) for _ in range(queries)]
+
+    # every weight is at least 1, so the grid distance never overestimates
+    def manhattan(target):
+        return lambda node: abs(node[0] - target[0]) + abs(node[1] - target[1])
+
+    searches = [
+        ('bfs', bfs_search),
+        ('bidirectional-bfs', bidirectional_bfs),
+        ('dijkstra', dijkstra_search),
+        ('bidirectional-dijkstra', bidirectional_dijkstra),
+        ('a-star manhattan', lambda g, a, b: a_star(g, a, b, manhattan(b))),
+        ('a-star landmarks', lambda g, a, b: a_star(g, a, b, alt.heuristic(b))),
+    ]
+
+    print('%d x %d grid, %d landmarks' % (width, width, landmarks))
+    for name, search in searches:
+        settled = 0
+        start = perf_counter()
+        for a, b in pairs:
+            settled += search(graph, a, b).settled
+        elapsed = perf_counter() - start
+        print('%24s: %10.0f settled, %8.1f ms per query' % (name, settled / queries, elapsed / queries * 1000))
+
+
+def benchmark_bfs(n=1_000_000, degree=8):
+    from time import perf_counter
+
+    rng = np.random.default_rng(0)
+    sources = rng.integers(0, n, n * degree // 2)
+    targets = rng.integers(0, n, n * degree // 2)
+    graph = CSRGraph.from_arrays(list(range(n)), sources, targets, np.ones(len(sources)))
+    print('%d nodes, %d edges' % (n, len(graph.targets)))
+
+    start = perf_counter()
+    breadth_first_search(graph, 0, lambda node: False)
+    print('%24s: %8.1f ms' % ('one node at a time', (perf_counter() - start) * 1000))
 
-    distances = {}
+    for name, options in (
+        ('frontier, top-down', dict(direction_optimizing=False)),
+        ('frontier, optimizing', dict()),
+        ('frontier, 2 processes', dict(direction_optimizing=False, processes=2)),
+    ):
+        start = perf_counter()
+        frontier_bfs(graph, [0], **options)
+        print('%24s: %8.1f ms' % (name, (perf_counter() - start) * 1000))
 
-    # transform edges dict into a dict of dicts
-    for source, (destination, weight) in graph.edges.iteritems():
-        if source not in distances:
-            distances[source] = {}
 
-        distances[source][destination] = weight
+def check_save_load(graph):
+    ''' Save graph to a temporary directory and check that it loads back unchanged. '''
+    from tempfile import TemporaryDirectory
 
-    for source in nodes:
-        distances[source][source] = 0
+    with TemporaryDirectory() as path:
+        graph.save(path)
+        loaded = CSRGraph.load(path, mmap=False)
 
-    for k in nodes:
-        for i in nodes:
-            for j in nodes:
-                direct = distances[i].get(j, sys.maxint)
-                intermediate1 = distances[i].get(k, sys.maxint)
-                intermediate2 = distances[k].get(j, sys.maxint)
+    assert loaded.labels == list(graph.labels)
+    assert loaded.directed == graph.directed
+    for a, b in ((graph.offsets, loaded.offsets), (graph.targets, loaded.targets), (graph.weights, loaded.weights)):
+        assert a.dtype == b.dtype and np.array_equal(a, b)
 
-                if direct > intermediate1 + intermediate2:
-                    distances[i][j] = intermediate1 + intermediate2
 
-    return distances
+if __name__ == '__main__':
+    check_save_load(grid_graph(30, 30))
+    check_save_load(CSRGraph.from_edges([(1, 'a'), ('a', 'b', 2.5)], directed=True))
+    benchmark_searches()
+    benchmark_bfs()
@@ -1,31 +1,86 @@
-def longest_increasing_subsequence(xs):
-    if not xs:
-        return 0
+from bisect import bisect_left, bisect_right
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+'''
+    Rather than the longest subsequence ending at each element (which means
+    looking back over every earlier element, O(n^2)), keep for each length
+    the smallest value that an increasing subsequence of that length can end
+    with so far. These "tails" are themselves increasing, so each new
+    element can binary search for the first tail it can replace (or append
+    past the end, extending the longest subsequence by one), O(n log n).
+    This is patience sorting, where the tails are the tops of the piles.
+
+    The tails are generally not a subsequence themselves, so to recover one,
+    each element remembers the element at the tail of the pile to its left
+    at the time it was added, and we follow those back from the last tail.
+
+    Since each element is only looked at once, the input can be a stream,
+    and the length so far is just the number of tails.
+'''
+class LongestIncreasingSubsequence:
+    def __init__(self, strict=True, key=None, reconstruct=False):
+        self.key = key
+        # for strictly increasing, an equal element replaces a tail,
+        # otherwise it goes after it
+        self.bisect = bisect_left if strict else bisect_right
+        self.reconstruct = reconstruct
+
+        self.tails = []
+        # only kept if reconstructing: the index of each tail's element,
+        # and every element along with the index of its predecessor
+        self.tail_indices = []
+        self.items = []
+        self.predecessors = []
+
+    def add(self, x):
+        k = self.key(x) if self.key else x
+        i = self.bisect(self.tails, k)
 
-    # table[n] represents the longest increasing subsequence
-    # that ends with the element xs[n]. thus the LIS for a
-    # subsequence that ends at the first element is just 1
-    table = [1]
+        if i == len(self.tails):
+            self.tails.append(k)
+        else:
+            self.tails[i] = k
 
-    for i in range(1, len(xs)):
-        # we can always just have a subsequence of just this element
-        best = 1
+        if self.reconstruct:
+            index = len(self.items)
+            self.items.append(x)
+            self.predecessors.append(self.tail_indices[i - 1] if i else -1)
 
-        # loop over the longest increasing subsequences ending at
-        # previous elements. maximize the value among those whose
-        # element is less than the current element
-        for j in range(0, i):
-            if xs[j] < xs[i]:
-                candidate = table[j] + 1
+            if i == len(self.tail_indices):
+                self.tail_indices.append(index)
+            else:
+                self.tail_indices[i] = index
+
+    def extend(self, xs):
+        for x in xs:
+            self.add(x)
+
+    def __len__(self):
+        return len(self.tails)
+
+    def sequence(self):
+        if not self.reconstruct:
+            raise ValueError('Pass reconstruct=True to recover the subsequence')
+
+        result = []
+        index = self.tail_indices[-1] if self.tail_indices else -1
+        while index >= 0:
+            result.append(self.items[index])
+            index = self.predecessors[index]
 
-                if candidate > best:
-                    best = candidate
+        result.reverse()
+        return result
 
-        table.append(best)
 
-    # we're still not sure exactly which element we want to end at.
-    # just take the max of all possibilities
-    return max(table)
+def longest_increasing_subsequence(xs, strict=True, key=None, return_sequence=False):
+    lis = LongestIncreasingSubsequence(strict, key, reconstruct=return_sequence)
+    lis.extend(xs)
+    return lis.sequence() if return_sequence else len(lis)
 
 
 '''
@@ -52,7 +107,233 @@ def longest_common_subsequence(xs, ys):
             if xs[i - 1] == ys[j - 1]:
                 table[i][j] = 1 + table[i - 1][j - 1]
             # otherwise, ignore this letter and take the best surrounding solution
+            # (the diagonal neighbour is never better than the other two)
             else:
-                table[i][j] = max([table[i - 1][j], table[i][j - 1], table[i - 1][j - 1]])
+                table[i][j] = max(table[i - 1][j], table[i][j - 1])
 
     return table[len(xs)][len(ys)]
+
+
+'''
+    The LCS length, a whole column of the table at a time (Allison and Dix,
+    in the form given by Hyyro 2004). Going down a column of the table, each
+    cell is either equal to the one above or one more; bit i of s is 0
+    where the column steps up at row i, so the LCS is the number of 0 bits.
+    One addition moves every step in the column at once: the carry ripples
+    through runs of 1s exactly like a match moving a step down the column.
+    Python ints are as long as they need to be, so this handles 64 rows per
+    machine word operation, all in C.
+'''
+def longest_common_subsequence_bits(xs, ys):
+    # the bits run along the shorter sequence
+    if len(ys) > len(xs):
+        xs, ys = ys, xs
+
+    m = len(ys)
+    if not m:
+        return 0
+
+    # for each element, a bit mask of where it appears in ys
+    matches = {}
+    for i, y in enumerate(ys):
+        matches[y] = matches.get(y, 0) | (1 << i)
+
+    mask = (1 << m) - 1
+    s = mask
+
+    for x in xs:
+        u = s & matches.get(x, 0)
+        s = ((s + u) | (s - u)) & mask
+
+    return m - bin(s).count('1')
+
+
+'''
+    The LCS length, a whole anti-diagonal of the table at a time with NumPy.
+    Cells on the same anti-diagonal (i + j = d) only depend on the previous
+    two anti-diagonals, not on each other, so each one is a few vector
+    operations, and only three anti-diagonals are kept at once.
+'''
+def longest_common_subsequence_antidiagonal(xs, ys):
+    m, n = len(xs), len(ys)
+    if not m or not n:
+        return 0
+
+    # number the elements, so any hashable elements can be compared as ints
+    codes = {}
+    x = np.array([codes.setdefault(e, len(codes)) for e in xs], dtype=np.int64)
+    # reversed, so that ys[d - i - 1] for increasing i is a contiguous slice
+    y = np.array([codes.setdefault(e, len(codes)) for e in reversed(ys)], dtype=np.int64)
+
+    # each diagonal is indexed by i. cells with i = 0 or j = 0 are always 0,
+    # and are never written to since they're outside every diagonal's range
+    before, previous, current = (np.zeros(m + 1, dtype=np.int64) for _ in range(3))
+
+    for d in range(2, m + n + 1):
+        low = max(1, d - n)
+        high = min(m, d - 1)
+
+        equal = x[low - 1:high] == y[n - d + low:n - d + high + 1]
+        current[low:high + 1] = np.where(
+            equal,
+            before[low - 1:high] + 1,
+            np.maximum(previous[low - 1:high], previous[low:high + 1]),
+        )
+        before, previous, current = previous, current, before
+
+    return int(previous[m])
+
+
+def benchmark(length=2000, long_length=100_000):
+    import random
+    from time import perf_counter
+
+    rng = random.Random(0)
+    for n in (length, long_length):
+        xs = ''.join(rng.choice('ACGT') for _ in range(n))
+        ys = ''.join(rng.choice('ACGT') for _ in range(n))
+
+        for name, lcs in (
+            ('table', longest_common_subsequence),
+            ('antidiagonal', longest_common_subsequence_antidiagonal),
+            ('bits', longest_common_subsequence_bits),
+        ):
+            # the others do all n^2 cells, which is too slow at this length
+            if n > length and lcs is not longest_common_subsequence_bits:
+                continue
+            start = perf_counter()
+            result = lcs(xs, ys)
+            print(f'{n:>7} {name:>12}: {result} in {(perf_counter() - start) * 1000:,.1f} ms')
+
+
+'''
+    The last row of the LCS table: the LCS length of xs with each prefix of ys.
+'''
+def _lcs_last_row(xs, ys):
+    previous = [0] * (len(ys) + 1)
+
+    for x in xs:
+        current = [0]
+        for j in range(1, len(ys) + 1):
+            if x == ys[j - 1]:
+                current.append(previous[j - 1] + 1)
+            else:
+                current.append(max(previous[j], current[j - 1]))
+        previous = current
+
+    return previous
+
+
+'''
+    The longest common subsequence itself (as a list), in O(len(xs) + len(ys))
+    memory using Hirschberg's divide and conquer. Split xs in half; the best
+    LCS splits ys somewhere too, at the point maximising the LCS of the top
+    half of xs with ys up to there, plus the LCS of the bottom half with the
+    rest. Both can be read off a single row of the table (the second by
+    running over the reversed strings), so no full table is ever kept.
+'''
+def longest_common_subsequence_hirschberg(xs, ys):
+    result = []
+    # the ranges of xs and ys left to solve, left-most on top
+    stack = [(0, len(xs), 0, len(ys))]
+
+    while stack:
+        i0, i1, j0, j1 = stack.pop()
+
+        if i0 == i1 or j0 == j1:
+            continue
+
+        if i1 - i0 == 1:
+            for j in range(j0, j1):
+                if ys[j] == xs[i0]:
+                    result.append(xs[i0])
+                    break
+            continue
+
+        middle = (i0 + i1) // 2
+        top = _lcs_last_row(xs[i0:middle], ys[j0:j1])
+        bottom = _lcs_last_row(xs[middle:i1][::-1], ys[j0:j1][::-1])
+
+        n = j1 - j0
+        split = max(range(n + 1), key=lambda k: top[k] + bottom[n - k])
+
+        stack.append((middle, i1, j0 + split, j1))
+        stack.append((i0, middle, j0, j0 + split))
+
+    return result
+
+
+'''
+    A shortest diff from xs to ys (Myers 1986), as a list of
+        ('equal', i, j), ('delete', i, None) and ('insert', None, j)
+    where the equal entries are a longest common subsequence.
+
+    Diagonal k of the edit graph holds the points (i, j) with i - j = k.
+    After d edits we can only be on diagonals -d..d, and v[k] remembers the
+    furthest point along diagonal k we've reached; each step tries one more
+    edit from its neighbours and then slides down any run of equal elements
+    for free. This takes O((m + n) * D) time for D edits, so it's much
+    faster than the table when the inputs are similar. Tracing back needs
+    each step's v, which is O(D^2) memory, again small for similar inputs.
+'''
+def myers_diff(xs, ys):
+    m, n = len(xs), len(ys)
+    v = {1: 0}
+    trace = []
+
+    for d in range(m + n + 1):
+        trace.append(v.copy())
+
+        for k in range(-d, d + 1, 2):
+            # come down from diagonal k + 1 (an insertion), or across from
+            # k - 1 (a deletion), whichever got further
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                i = v[k + 1]
+            else:
+                i = v[k - 1] + 1
+            j = i - k
+
+            while i < m and j < n and xs[i] == ys[j]:
+                i += 1
+                j += 1
+            v[k] = i
+
+            if i >= m and j >= n:
+                return _myers_backtrack(xs, ys, trace, d)
+
+
+def _myers_backtrack(xs, ys, trace, d):
+    script = []
+    i, j = len(xs), len(ys)
+
+    # trace[d] is v as it was before step d, so it tells us where step d
+    # started from. step 0 is the free slide down diagonal 0 from (0, 0)
+    for d in range(d, -1, -1):
+        v = trace[d]
+        k = i - j
+
+        if k == -d or (k != d and v[k - 1] < v[k + 1]):
+            previous_k = k + 1
+        else:
+            previous_k = k - 1
+        previous_i = v[previous_k]
+        previous_j = previous_i - previous_k
+
+        while i > previous_i and j > previous_j:
+            i -= 1
+            j -= 1
+            script.append(('equal', i, j))
+
+        if d > 0:
+            if i == previous_i:
+                script.append(('insert', None, previous_j))
+            else:
+                script.append(('delete', previous_i, None))
+            i, j = previous_i, previous_j
+
+    script.reverse()
+    return script
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -1,6 +1,26 @@
-import sys
+from heapq import heappop, heappush
+from itertools import count
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+'''
+    These all take a graph whose edges attribute maps each node to a list of
+    (neighbour, weight) pairs (like UndirectedGraph in alg-graph-search.py),
+    and return the minimum spanning tree as a list of (a, b, weight) edges
+    along with its total weight. If the graph isn't connected, that's a
+    minimum spanning forest: a tree for each component. Edges without a
+    weight count as 1.
+'''
+
+
+def _weight(weight):
+    return 1 if weight is None else weight
 
-INFINITY = sys.maxint - 1
 
 '''
     Prim's algorithm finds the minimum spanning tree for a graph. It does so
@@ -12,40 +32,258 @@ INFINITY = sys.maxint - 1
     by keeping track of the cheapest edge from each node. In subsequent iterations,
     we take the cheapest edge from the not-yet-included nodes, include it, and
     update the cheapest edges to the nodes connected to that one.
-'''
 
+    Scanning every excluded node for the cheapest makes that O(V^2). Keeping
+    the edges leaving the tree in a heap instead makes it O(E log V): edges
+    whose far end has joined the tree since they were pushed are just
+    skipped when they come up.
+'''
 def prims_algorithm(graph):
     included_nodes = set()
-    excluded_nodes = set(graph.edges.keys())
+    result = []
+    total = 0
+    # breaks ties, so nodes are never compared
+    order = count()
 
-    cheapest_cost = {}
-    cheapest_edge = {}
+    for root in graph.edges:
+        if root in included_nodes:
+            continue
+
+        # a new component: grow a tree from here
+        included_nodes.add(root)
+        heap = [(_weight(cost), next(order), destination, root) for destination, cost in graph.edges[root]]
+        heap.sort()
+
+        while heap:
+            cost, _, min_node, source = heappop(heap)
+            if min_node in included_nodes:
+                continue
+
+            included_nodes.add(min_node)
+            result.append((source, min_node, cost))
+            total += cost
+
+            for destination, cost in graph.edges[min_node]:
+                if destination not in included_nodes:
+                    heappush(heap, (_weight(cost), next(order), destination, min_node))
+
+    return result, total
+
+
+'''
+    The graph's edges as NumPy arrays: (labels, sources, targets, weights),
+    where sources and targets are indices into labels. Each undirected edge
+    appears once, and self loops (never part of a spanning tree) are dropped.
+'''
+def edge_arrays(graph):
+    labels = list(graph.edges)
+    ids = {label: i for i, label in enumerate(labels)}
+
+    sources, targets, weights = [], [], []
+    for a in labels:
+        i = ids[a]
+        for b, weight in graph.edges[a]:
+            # each edge is listed under both of its ends; keep one
+            j = ids[b]
+            if i < j:
+                sources.append(i)
+                targets.append(j)
+                weights.append(_weight(weight))
+
+    return labels, np.array(sources, dtype=np.int64), np.array(targets, dtype=np.int64), np.array(weights)
+
+
+def _labelled(labels, sources, targets, weights, chosen):
+    edges = [
+        (labels[a], labels[b], weight)
+        for a, b, weight in zip(sources[chosen].tolist(), targets[chosen].tolist(), weights[chosen].tolist())
+    ]
+    return edges, sum(weight for _, _, weight in edges)
+
+
+'''
+    Kruskal's algorithm goes through the edges from cheapest to most expensive,
+    keeping each one that joins two different trees. A union-find over plain
+    lists tracks which tree each node is in (see UnionFind in
+    alg-graph-search.py), and a single NumPy argsort orders the edges. We can
+    stop as soon as we have n - 1 edges.
+'''
+def kruskals_algorithm(graph):
+    labels, sources, targets, weights = edge_arrays(graph)
+    chosen = kruskal_arrays(len(labels), sources, targets, weights)
+    return _labelled(labels, sources, targets, weights, chosen)
+
+
+def kruskal_arrays(n, sources, targets, weights):
+    ''' The indices of the edges in a minimum spanning forest of n nodes. '''
+    parents = list(range(n))
+    ranks = [0] * n
+    chosen = []
+
+    def root(i):
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+
+    order = np.argsort(weights, kind='stable')
+    for e, a, b in zip(order.tolist(), sources[order].tolist(), targets[order].tolist()):
+        a, b = root(a), root(b)
+        if a == b:
+            continue
+
+        if ranks[a] < ranks[b]:
+            a, b = b, a
+        elif ranks[a] == ranks[b]:
+            ranks[a] += 1
+        parents[b] = a
+
+        chosen.append(e)
+        if len(chosen) == n - 1:
+            break
+
+    return np.array(chosen, dtype=np.int64)
+
+
+'''
+    Boruvka's algorithm works in rounds: every tree picks the cheapest edge
+    leaving it, and all of those are added at once. Each round at least
+    halves the number of trees, so there are at most log V rounds, and each
+    round is the same simple operation over every edge, which vectorises
+    well and splits cleanly across processes (each takes a share of the
+    edges, and the cheapest per tree is the cheapest of their answers).
+
+    Ties are broken by position in weight order, so there's always a single
+    cheapest edge per tree and the chosen edges can never form a cycle.
+    Joining the trees is vectorised too: each tree points at the tree across
+    its chosen edge, two trees that chose the same edge point at each other
+    (the smaller one becomes the root instead), and following the pointers
+    until nothing changes (pointer jumping) finds each tree's new root.
+'''
+def boruvkas_algorithm(graph, processes=None):
+    labels, sources, targets, weights = edge_arrays(graph)
+    chosen = boruvka_arrays(len(labels), sources, targets, weights, processes)
+    return _labelled(labels, sources, targets, weights, chosen)
+
+
+def boruvka_arrays(n, sources, targets, weights, processes=None):
+    ''' The indices of the edges in a minimum spanning forest of n nodes. '''
+    # put the edges in weight order, so an edge's position is its rank
+    order = np.argsort(weights, kind='stable')
+    sources, targets = sources[order], targets[order]
+    m = len(order)
+    if not m:
+        return np.array([], dtype=np.int64)
+
+    memory = SharedMemory(create=True, size=max(1, 8 * n))
+    tree = np.ndarray(n, dtype=np.int64, buffer=memory.buf)
+    tree[:] = np.arange(n)
+
+    pool = None
+    if processes:
+        step = -(-m // processes)
+        chunks = [(start, min(start + step, m)) for start in range(0, m, step)]
+        pool = Pool(processes, initializer=_boruvka_attach, initargs=(sources, targets, memory.name, n))
+
+    chosen = []
+    live = np.arange(m)
+    nodes = np.arange(n)
+    try:
+        while True:
+            if pool:
+                cheapest = np.minimum.reduce(pool.map(_boruvka_cheapest, chunks))
+            else:
+                # drop edges inside a tree, they'll never be chosen again
+                live = live[tree[sources[live]] != tree[targets[live]]]
+                cheapest = _cheapest(tree, sources[live], targets[live], live, n)
+
+            has_edge = cheapest < m
+            if not has_edge.any():
+                break
+
+            edges = np.unique(cheapest[has_edge])
+            chosen.append(edges)
+
+            # each tree points across its cheapest edge
+            trees = np.flatnonzero(has_edge)
+            e = cheapest[trees]
+            a, b = tree[sources[e]], tree[targets[e]]
+            pointer = nodes.copy()
+            pointer[trees] = np.where(a == trees, b, a)
+
+            # two trees that picked the same edge point at each other
+            mutual = (pointer[pointer] == nodes) & (pointer > nodes)
+            pointer[mutual] = nodes[mutual]
+
+            while True:
+                jumped = pointer[pointer]
+                if np.array_equal(jumped, pointer):
+                    break
+                pointer = jumped
+
+            tree[:] = pointer[tree]
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        del tree
+        memory.close()
+        memory.unlink()
+
+    return order[np.concatenate(chosen)] if chosen else np.array([], dtype=np.int64)
+
+
+def _cheapest(tree, sources, targets, edges, n):
+    ''' For each tree, the first (cheapest) of edges leaving it, or the largest int64 for none. '''
+    a, b = tree[sources], tree[targets]
+    leaving = a != b
+
+    cheapest = np.full(n, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(cheapest, a[leaving], edges[leaving])
+    np.minimum.at(cheapest, b[leaving], edges[leaving])
+    return cheapest
+
+
+# the edges and the shared tree array, in each worker process
+_boruvka_shared = {}
 
-    result = []
 
-    while excluded_nodes:
+def _boruvka_attach(sources, targets, name, n):
+    memory = SharedMemory(name=name)
+    _boruvka_shared.update(
+        sources=sources,
+        targets=targets,
+        memory=memory,
+        tree=np.ndarray(n, dtype=np.int64, buffer=memory.buf),
+    )
 
-        min_cost = sys.maxint
-        min_node = None
 
-        for node in excluded_nodes:
-            cost = cheapest_cost(node, INFINITY)
+def _boruvka_cheapest(chunk):
+    start, stop = chunk
+    shared = _boruvka_shared
+    tree = shared['tree']
+    return _cheapest(tree, shared['sources'][start:stop], shared['targets'][start:stop], np.arange(start, stop), len(tree))
 
-            if cost < min_cost:
-                min_cost = cost
-                min_node = node
 
-        excluded_nodes.remove(min_node)
-        included_nodes.add(min_node)
+def benchmark(n=200_000, degree=10, processes=2):
+    from time import perf_counter
 
-        edge = cheapest_edge.get(min_node)
+    rng = np.random.default_rng(0)
+    m = n * degree // 2
+    sources = rng.integers(0, n, m)
+    targets = rng.integers(0, n, m)
+    weights = rng.random(m)
 
-        if edge:
-            result.append( (min_node, edge) )
+    for name, mst in (
+        ('kruskal', lambda: kruskal_arrays(n, sources, targets, weights)),
+        ('boruvka', lambda: boruvka_arrays(n, sources, targets, weights)),
+        ('boruvka, %d processes' % processes, lambda: boruvka_arrays(n, sources, targets, weights, processes)),
+    ):
+        start = perf_counter()
+        chosen = mst()
+        elapsed = perf_counter() - start
+        print('%24s: %d edges, weight %.3f in %.2f s' % (name, len(chosen), weights[chosen].sum(), elapsed))
 
-        for destination, cost in graph.edges[min_node]:
-            if destination in excluded_nodes and cost < cheapest_cost.get(destination, INFINITY):
-                cheapest_cost[destination] = cost
-                cheapest_edge[destination] = min_node
 
-    return result
+if __name__ == '__main__':
+    benchmark()
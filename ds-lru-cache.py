@@ -9,29 +9,503 @@ end of the list, we get O(1) insertions.
 
 The hashmap provides O(1) random access to the cache, which we don't have with
 just the linked list.
+
+Sharing one cache between threads needs a lock, and since even `get` relinks
+the list, every access would contend on it. Splitting the keys across N
+independently locked segments (each its own little LRU cache) divides that
+contention by N, at the cost of evicting per-segment rather than globally.
+Reads can avoid the lock entirely by recording hits in a buffer and applying
+them to the list in batches, whenever some thread gets the lock anyway. The
+recency order becomes slightly approximate, which barely matters in practice.
+
+Each node is a separate object pointing at its neighbours, which costs a lot
+of memory per entry. Since the cache never holds more than `size` entries,
+we can instead preallocate parallel arrays (keys, values, prev, next) and
+refer to nodes by their index into them. Links become plain integers, no
+objects are allocated per entry, and freed slots are reused via a free list.
+The key -> slot hash map gets the same treatment, as an open-addressing
+table of slot numbers.
+
+Pure LRU has one big weakness: a single scan over lots of keys that are
+never read again pushes every hot entry out of the cache. Scan-resistant
+policies only let an entry into the "important" part of the cache once it
+has proven itself:
+
+ - 2Q puts new keys in a small FIFO, and only keys that come back after
+   falling out of it (tracked by a "ghost" list of recently dropped keys)
+   are admitted to the main LRU.
+
+ - ARC keeps two LRU lists, for keys seen once and keys seen more than once,
+   plus a ghost list for each. Hits in a ghost list show which of the two
+   lists was too small, and the split between them adapts accordingly.
+
+ - W-TinyLFU estimates how often every key has been accessed with a
+   count-min sketch, and a new key only evicts the main cache's victim if it
+   is accessed more frequently. Counters are halved periodically so that
+   old popularity fades. A small LRU "window" in front absorbs bursts.
+
+These use OrderedDict, which is the same hash map + doubly-linked list as
+LRUCache, implemented in C.
+
+Entries can also expire after a TTL. Checking the expiry on every read is
+enough for correctness, but expired entries that are never read again would
+sit there taking up space, so a timer wheel (a ring of buckets, one per
+tick) lets us find everything due to expire by only looking at the buckets
+for the ticks that have passed. Capacity can be measured in arbitrary
+units (like bytes) by giving the cache a `weigher` for its entries.
+
+Statistics are optional. When on, each hit, miss, eviction and load bumps a
+counter, and only one operation in every `sample_every` is timed, since
+reading the clock twice would cost more than the operation itself. A hit
+only bumps its one counter (gets are hits + misses), and a sampled hit is
+timed by repeating it afterwards, which changes nothing. That keeps the
+overhead down to the counter update itself, a few percent on a big cache
+but more like 10-15% on one small enough to stay in the CPU caches. The
+timings go into a histogram with power-of-two buckets, which is enough to
+estimate percentiles in constant memory.
+
+Instead of dropping evicted entries, the cache can spill them to a disk
+tier: an append-only file of (key, value) records, with an in-memory index
+from key to offset, read back through mmap so the OS page cache does the
+buffering. Appending is the cheapest possible write, and overwritten or
+promoted records are just left behind (a later record, or a tombstone,
+supersedes them) until the file is compacted. Since the file outlives the
+process, and the memory tier can be dumped and restored in recency order,
+a restarted cache starts warm.
 """
 
-from typing import Generic, Optional, TypeVar
+import asyncio
+import functools
+import inspect
+import mmap
+import os
+import pickle
+import struct
+import threading
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from time import monotonic, perf_counter
+from typing import (
+    Awaitable, Callable, Deque, Dict, Generic, Hashable, Iterable, List, Optional, Tuple, TypeVar,
+)
 
 K = TypeVar('K')
 V = TypeVar('V')
 
 
-class LRUCache(Generic[K, V]):
+class CacheStats:
+    # the counters are bumped on every operation, and slot attributes are
+    # noticeably cheaper to update than ones stored in a __dict__
+    __slots__ = (
+        "hits", "inserts", "misses", "evictions", "expirations",
+        "loads", "load_failures", "load_time", "sample_mask", "next_hit_sample", "latency",
+    )
+
+    def __init__(self, sample_every: int = 256) -> None:
+        # gets are hits + misses, so a hit only has one counter to update
+        self.hits = 0
+        self.inserts = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.loads = 0
+        self.load_failures = 0
+        self.load_time = 0.0
+
+        # an operation is timed whenever its own counter (hits, misses or
+        # inserts) is a multiple of sample_every (rounded up to a power of
+        # two, so it's just a mask). counting each kind separately means a
+        # workload that alternates them can't end up only ever sampling one
+        # sample_every=1 gives a mask of 0, timing everything
+        self.sample_mask = (1 << (max(1, sample_every) - 1).bit_length()) - 1
+        # hits compare against this instead, since == on ints is a lot
+        # cheaper than & in CPython, and hits are the hot path
+        self.next_hit_sample = self.sample_mask + 1
+
+        # op -> counts, where bucket b holds latencies in [2 ** (b - 1), 2 ** b) ns
+        self.latency: Dict[str, List[int]] = {}
+
+    def record_latency(self, op: str, seconds: float) -> None:
+        buckets = self.latency.get(op)
+        if buckets is None:
+            buckets = self.latency[op] = [0] * 64
+
+        buckets[min(63, int(seconds * 1e9).bit_length())] += 1
+
+    @staticmethod
+    def _percentile(buckets: List[int], q: float) -> float:
+        """ An upper bound (in microseconds) on the q'th quantile. """
+        rank = q * sum(buckets)
+        seen = 0
+        for b, count in enumerate(buckets):
+            seen += count
+            if seen >= rank:
+                return (2 ** b) / 1000
+        return 0.0
+
+    def snapshot(self) -> Dict[str, object]:
+        gets = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / gets if gets else 0.0,
+            "inserts": self.inserts,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "loads": self.loads,
+            "load_failures": self.load_failures,
+            "mean_load_ms": self.load_time / self.loads * 1000 if self.loads else 0.0,
+            "latency_us": {
+                op: {
+                    "samples": sum(buckets),
+                    "p50": self._percentile(buckets, 0.5),
+                    "p99": self._percentile(buckets, 0.99),
+                }
+                for op, buckets in self.latency.items()
+            },
+        }
+
+    def merge(self, other: "CacheStats") -> None:
+        for field in ("hits", "inserts", "misses", "evictions", "expirations", "loads", "load_failures", "load_time"):
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+
+        for op, buckets in other.latency.items():
+            mine = self.latency.setdefault(op, [0] * 64)
+            for b, count in enumerate(buckets):
+                mine[b] += count
+
+
+def report_stats(snapshot: Callable[[], Dict[str, object]], callback: Callable[[Dict[str, object]], None],
+                 interval: float) -> Callable[[], None]:
+    """
+    Call `callback` with a fresh snapshot every `interval` seconds from a
+    background thread, e.g. to ship to a metrics pipeline. Returns a function
+    that stops the reporting.
+    """
+    stopped = threading.Event()
+
+    def run() -> None:
+        while not stopped.wait(interval):
+            callback(snapshot())
+
+    threading.Thread(target=run, daemon=True).start()
+    return stopped.set
+
+
+class DiskTier(Generic[K, V]):
+    """
+    Records are a header of (key length, value length) followed by the pickled
+    key and value. A value length of TOMBSTONE marks the key as deleted.
+    Keys and values must be picklable, and only files we wrote ourselves
+    should ever be opened, since unpickling can run arbitrary code.
+    """
+
+    HEADER = struct.Struct("<II")
+    TOMBSTONE = 0xffffffff
+
+    def __init__(self, path: str, compact_min_bytes: int = 64 * 1024 * 1024) -> None:
+        self.path = path
+        self.compact_min_bytes = compact_min_bytes
+        self.lock = threading.Lock()
+
+        # key -> (offset, length) of its pickled value, and the length of its
+        # whole record. live counts the bytes of the records still in use
+        self.index: Dict[K, Tuple[int, int, int]] = {}
+        self.live = 0
+        self.size = 0
+
+        self.file = None
+        self.map = None
+        self.mapped = 0
+        self._open()
+
+    def _open(self) -> None:
+        self.file = open(self.path, "a+b")
+        self.index = {}
+        self.live = 0
+        self._remap()
+
+        # rebuild the index by replaying the log, later records winning
+        offset = 0
+        while offset + self.HEADER.size <= self.mapped:
+            key_length, value_length = self.HEADER.unpack_from(self.map, offset)
+            key_start = offset + self.HEADER.size
+            value_start = key_start + key_length
+            end = value_start + (0 if value_length == self.TOMBSTONE else value_length)
+
+            if end > self.mapped:
+                # a record torn by a crash mid-append
+                break
+
+            key = pickle.loads(self.map[key_start:value_start])
+            self._forget(key)
+
+            if value_length != self.TOMBSTONE:
+                self.index[key] = (value_start, value_length, end - offset)
+                self.live += end - offset
+
+            offset = end
+
+        if offset < self.mapped:
+            self.file.truncate(offset)
+            self._remap()
+
+        self.size = offset
+
+    def _remap(self) -> None:
+        self.file.flush()
+        if self.map is not None:
+            self.map.close()
+
+        self.mapped = os.fstat(self.file.fileno()).st_size
+        # an empty file can't be mapped
+        self.map = mmap.mmap(self.file.fileno(), self.mapped, access=mmap.ACCESS_READ) if self.mapped else None
+
+    def _forget(self, key: K) -> bool:
+        entry = self.index.pop(key, None)
+        if entry is None:
+            return False
+
+        self.live -= entry[2]
+        return True
+
+    def _append(self, key: K, value_bytes: Optional[bytes]) -> int:
+        key_bytes = pickle.dumps(key)
+        value_length = self.TOMBSTONE if value_bytes is None else len(value_bytes)
+
+        self.file.write(self.HEADER.pack(len(key_bytes), value_length))
+        self.file.write(key_bytes)
+        if value_bytes is not None:
+            self.file.write(value_bytes)
+
+        value_start = self.size + self.HEADER.size + len(key_bytes)
+        self.size = value_start + (len(value_bytes) if value_bytes is not None else 0)
+        return value_start
+
+    def _read(self, key: K) -> Optional[V]:
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+
+        offset, length, _ = entry
+        if offset + length > self.mapped:
+            # it was appended after we last mapped the file
+            self._remap()
+
+        return pickle.loads(self.map[offset:offset + length])
+
+    def put(self, key: K, value: V) -> None:
+        value_bytes = pickle.dumps(value)
+
+        with self.lock:
+            self._forget(key)
+            start = self.size
+            value_start = self._append(key, value_bytes)
+            self.index[key] = (value_start, len(value_bytes), self.size - start)
+            self.live += self.size - start
+
+            # most of the file is dead records: rewrite it
+            if self.size > self.compact_min_bytes and self.live < self.size // 2:
+                self._compact()
+
+    def get(self, key: K) -> Optional[V]:
+        with self.lock:
+            return self._read(key)
+
+    def pop(self, key: K) -> Optional[V]:
+        with self.lock:
+            value = self._read(key)
+            if value is not None:
+                self._forget(key)
+                self._append(key, None)
+            return value
+
+    def discard(self, key: K) -> None:
+        with self.lock:
+            if self._forget(key):
+                self._append(key, None)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def _compact(self) -> None:
+        # copy just the live records into a new file, then swap it in
+        self._remap()
+        tmp = self.path + ".compact"
+
+        with open(tmp, "wb") as out:
+            for key, (offset, length, _) in self.index.items():
+                key_bytes = pickle.dumps(key)
+                out.write(self.HEADER.pack(len(key_bytes), length))
+                out.write(key_bytes)
+                out.write(self.map[offset:offset + length])
+
+        self.map.close()
+        self.map = None
+        self.file.close()
+        os.replace(tmp, self.path)
+        self._open()
+
+    def compact(self) -> None:
+        with self.lock:
+            self._compact()
+
+    def close(self) -> None:
+        with self.lock:
+            self.file.flush()
+            if self.map is not None:
+                self.map.close()
+                self.map = None
+            self.file.close()
+
+
+class Loading(Generic[K, V]):
+    """
+    get_or_load for any cache with `get` and `insert`. Concurrent misses for
+    the same key wait for a single in-flight load instead of each hitting the
+    backend (a "cache stampede"). Futures are how the waiters get the result.
+    """
+
+    def _init_loading(self) -> None:
+        self.loading: Dict[K, Future] = {}
+        self.loading_lock = threading.Lock()
+        self.async_loading: Dict[K, asyncio.Future] = {}
+
+    def get_or_load(self, key: K, loader: Callable[[K], V]) -> V:
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self.loading_lock:
+            future = self.loading.get(key)
+            owner = future is None
+            if owner:
+                future = self.loading[key] = Future()
+
+        if not owner:
+            return future.result()
+
+        stats = self._stats()
+        start = perf_counter()
+
+        try:
+            value = loader(key)
+            self.insert(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            if stats is not None:
+                stats.load_failures += 1
+            future.set_exception(e)
+            raise
+        finally:
+            if stats is not None:
+                stats.loads += 1
+                stats.load_time += perf_counter() - start
+            with self.loading_lock:
+                del self.loading[key]
+
+    async def aget_or_load(self, key: K, loader: Callable[[K], Awaitable[V]]) -> V:
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        # everything here runs on one event loop, so no lock is needed
+        future = self.async_loading.get(key)
+        if future is not None:
+            # shield, so that a cancelled waiter doesn't cancel everyone's load
+            return await asyncio.shield(future)
+
+        future = self.async_loading[key] = asyncio.get_running_loop().create_future()
+        stats = self._stats()
+        start = perf_counter()
+
+        try:
+            value = await loader(key)
+            self.insert(key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            if stats is not None:
+                stats.load_failures += 1
+            future.set_exception(e)
+            # mark it retrieved, so there's no warning if nobody was waiting
+            future.exception()
+            raise
+        finally:
+            if stats is not None:
+                stats.loads += 1
+                stats.load_time += perf_counter() - start
+            del self.async_loading[key]
+
+    def _stats(self) -> Optional[CacheStats]:
+        """ Where to record loads, if anywhere. """
+        return None
+
+
+class LRUCache(Loading[K, V]):
 
     class Node(Generic[K, V]):
-        def __init__(self, key: K, value: V) -> None:
+        # no per-instance __dict__, which roughly halves the size of a node
+        __slots__ = ("key", "value", "prev", "next", "weight", "expires")
+
+        def __init__(self, key: K, value: V, weight: int = 1, expires: Optional[float] = None) -> None:
             self.key = key
             self.value = value
             self.prev = None
             self.next = None
+            self.weight = weight
+            self.expires = expires
 
-    def __init__(self, size: int) -> None:
+    def __init__(
+        self,
+        size: int,
+        ttl: Optional[float] = None,
+        weigher: Optional[Callable[[K, V], int]] = None,
+        clock: Callable[[], float] = monotonic,
+        tick: float = 1.0,
+        wheel_slots: int = 512,
+        record_stats: bool = False,
+        sample_every: int = 256,
+        disk: Optional[DiskTier[K, V]] = None,
+    ) -> None:
+        # with a weigher, size is the total weight (e.g. bytes) rather than a count
         self.size = size
+        self.weight = 0
+        self.weigher = weigher
         self.lookup = {}
         self.first = None
         self.last = None
 
+        # expiry is checked lazily on every get, and a timer wheel sweeps up
+        # expired entries that nobody reads: bucket i holds the nodes expiring
+        # in ticks i, i + wheel_slots, i + 2 * wheel_slots, ...
+        self.ttl = ttl
+        self.clock = clock
+        self.tick = tick
+        self.wheel: List[set] = [set() for _ in range(wheel_slots)]
+        self.wheel_tick = int(clock() / tick)
+        # whether any entry has ever had a ttl; if not, skip the wheel entirely
+        self.timed = ttl is not None
+
+        self.stats = CacheStats(sample_every) if record_stats else None
+
+        # a key lives in at most one tier: evictions move it to disk, and
+        # promotions and inserts take it back off
+        self.disk = disk
+
+        self._init_loading()
+
+    def _stats(self) -> Optional[CacheStats]:
+        return self.stats
+
     def _insert_node_at_end(self, new_node: Node[K, V]) -> None:
         if self.lookup:
             # insertion into a non-empty list
@@ -59,33 +533,970 @@ class LRUCache(Generic[K, V]):
 
             self._insert_node_at_end(existing_node)
 
-    def insert(self, key: K, value: V) -> None:
+    def _remove_node(self, node: Node[K, V]) -> None:
+        if node.prev:
+            node.prev.next = node.next
+        else:
+            self.first = node.next
+
+        if node.next:
+            node.next.prev = node.prev
+        else:
+            self.last = node.prev
+
+        node.prev = None
+        node.next = None
+        self.weight -= node.weight
+        del self.lookup[node.key]
+
+    def _schedule(self, node: Node[K, V]) -> None:
+        if node.expires is not None:
+            self.wheel[int(node.expires / self.tick) % len(self.wheel)].add(node)
+
+    def expire(self) -> None:
+        """ Advance the timer wheel to now, dropping everything that has expired. """
+        now = self.clock()
+        target = int(now / self.tick)
+        if target == self.wheel_tick:
+            return
+
+        # only sweep the ticks that have fully passed: the current one may
+        # still be filling up, and get checks its entries' expiry anyway.
+        # if we fell more than a whole revolution behind, one lap covers everything
+        slots = len(self.wheel)
+        start = max(self.wheel_tick, target - slots)
+
+        for t in range(start, target):
+            bucket = self.wheel[t % slots]
+
+            for node in list(bucket):
+                if self.lookup.get(node.key) is not node or node.expires is None:
+                    # evicted, replaced or no longer expiring: a stale reference
+                    bucket.discard(node)
+                elif node.expires <= now:
+                    bucket.discard(node)
+                    self._remove_node(node)
+                    if self.stats is not None:
+                        self.stats.expirations += 1
+                elif int(node.expires / self.tick) % slots != t % slots:
+                    # its expiry was moved to another bucket
+                    bucket.discard(node)
+
+        self.wheel_tick = target
+
+    def insert(self, key: K, value: V, ttl: Optional[float] = None) -> None:
+        stats = self.stats
+        start = None
+        if stats is not None:
+            stats.inserts += 1
+            if not stats.inserts & stats.sample_mask:
+                start = perf_counter()
+
+        ttl = self.ttl if ttl is None else ttl
+        expires = None
+
+        if ttl is not None:
+            self.timed = True
+            expires = self.clock() + ttl
+
+        if self.timed:
+            self.expire()
+
+        weight = self.weigher(key, value) if self.weigher else 1
+
         existing = self.lookup.get(key)
 
         if existing:
             # if we're overwriting a key, make sure to handle the existing node
             existing.value = value
+            existing.expires = expires
+            self.weight += weight - existing.weight
+            existing.weight = weight
             self._move_node_to_end(existing)
-        else:
-            node = LRUCache.Node(key, value)
-
-            if len(self.lookup) < self.size:
-                # cache is not full yet, so we can just insert at the end
-                self._insert_node_at_end(node)
-            else:
-                # cache is full, so we need to delete the least recently used node
-                lru = self.first
-                self.first = lru.next
-                self._insert_node_at_end(node)
-                del self.lookup[lru.key]
+            self._schedule(existing)
+        elif weight <= self.size:
+            # (an entry heavier than the whole cache is never stored)
+            if self.disk is not None:
+                self.disk.discard(key)
 
+            node = LRUCache.Node(key, value, weight, expires)
+            self._insert_node_at_end(node)
             self.lookup[key] = node
+            self.weight += weight
+            self._schedule(node)
+
+        # delete least recently used nodes until everything fits again
+        while self.weight > self.size:
+            self._evict_first()
+
+        if start is not None:
+            stats.record_latency("insert", perf_counter() - start)
+
+    def _evict_first(self) -> None:
+        node = self.first
+        self._remove_node(node)
+
+        if self.stats is not None:
+            self.stats.evictions += 1
+
+        # entries with a ttl stay in memory only, since the monotonic clock
+        # their expiry is measured against doesn't survive a restart
+        if self.disk is not None and node.expires is None:
+            self.disk.put(node.key, node.value)
 
     def get(self, key: K) -> Optional[V]:
         node = self.lookup.get(key)
-        if not node:
-            return None
+        if not node or (node.expires is not None and node.expires <= self.clock()):
+            stats = self.stats
+            if stats is not None and not (stats.hits + stats.misses + 1) & stats.sample_mask:
+                start = perf_counter()
+                value = self._get_missing(key, node)
+                stats.record_latency("get", perf_counter() - start)
+                return value
+
+            return self._get_missing(key, node)
 
         # record the fact that it was used recently
-        self._move_node_to_end(node) 
+        self._move_node_to_end(node)
+
+        # a hit is the hot path, so it only bumps one counter, and is timed
+        # after the fact: doing it again changes nothing, so that's what we time
+        stats = self.stats
+        if stats is not None:
+            hits = stats.hits = stats.hits + 1
+            if hits == stats.next_hit_sample:
+                stats.next_hit_sample += stats.sample_mask + 1
+                start = perf_counter()
+                self._move_node_to_end(self.lookup.get(key))
+                stats.record_latency("get", perf_counter() - start)
+
+        return node.value
+
+    def _get_missing(self, key: K, node: Optional[Node[K, V]]) -> Optional[V]:
+        # a get for a key that's expired, on disk or not here at all
+        stats = self.stats
+
+        if node:
+            self._remove_node(node)
+            if stats is not None:
+                stats.expirations += 1
+        elif self.disk is not None:
+            value = self.disk.pop(key)
+            if value is not None:
+                # promote it back into memory, which may spill something else
+                self.insert(key, value)
+                if stats is not None:
+                    stats.hits += 1
+                return value
+
+        if stats is not None:
+            stats.misses += 1
+        return None
+
+    def snapshot(self) -> Dict[str, object]:
+        if self.stats is None:
+            raise Exception("Statistics are not enabled")
+
+        return self.stats.snapshot()
+
+    def items(self) -> Iterable[Tuple[K, V, Optional[float]]]:
+        """ Every (key, value, remaining ttl), least recently used first. """
+        now = self.clock()
+        node = self.first
+
+        while node:
+            ttl = None if node.expires is None else node.expires - now
+            if ttl is None or ttl > 0:
+                yield node.key, node.value, ttl
+            node = node.next
+
+    def dump(self, path: str) -> None:
+        """ Save the in-memory tier, so that `restore` can warm up a new cache. """
+        dump_items(self.items(), path)
+
+    def restore(self, path: str) -> None:
+        # inserting least recently used first recreates the same recency order
+        for key, value, ttl in load_items(path):
+            self.insert(key, value, ttl)
+
+
+def dump_items(items: Iterable[Tuple[K, V, Optional[float]]], path: str) -> None:
+    # write to a temporary file and rename it, so a crash never leaves a
+    # half-written snapshot where the last good one used to be
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        for item in items:
+            pickle.dump(item, f)
+
+    os.replace(tmp, path)
+
+
+def load_items(path: str) -> Iterable[Tuple[K, V, Optional[float]]]:
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+class ConcurrentLRUCache(Loading[K, V]):
+
+    def __init__(self, size: int, segments: int = 16, read_buffer_size: Optional[int] = None, **options) -> None:
+        segments = max(1, min(segments, size))
+
+        # each segment only gets its share of the total weight, so an entry
+        # heavier than size / segments could never be cached
+        if options.get("weigher") is not None and segments > 1:
+            raise ValueError("A weighted ConcurrentLRUCache must have segments=1")
+
+        # split the capacity so that the segments add up to exactly `size`.
+        # any other options (ttl, weigher, ...) are passed on to every segment
+        base, extra = divmod(size, segments)
+        self.size = size
+        self.segments: List[LRUCache[K, V]] = [
+            LRUCache(base + (1 if i < extra else 0), **options) for i in range(segments)
+        ]
+        self.locks = [threading.Lock() for _ in range(segments)]
+
+        # hits waiting to be applied to each segment's list. a bounded deque
+        # silently drops the oldest entry when full, which only costs us a
+        # little recency accuracy (appends are atomic, so no lock is needed)
+        self.read_buffer_size = read_buffer_size
+        self.buffers: List[Deque[LRUCache.Node[K, V]]] = [
+            deque(maxlen=read_buffer_size) for _ in range(segments)
+        ] if read_buffer_size else []
+
+        self._init_loading()
+
+    def _segment(self, key: K) -> int:
+        return hash(key) % len(self.segments)
+
+    def _drain(self, i: int) -> None:
+        # must hold self.locks[i]
+        segment = self.segments[i]
+        buffer = self.buffers[i]
+
+        while buffer:
+            node = buffer.popleft()
+
+            # the node may have been evicted or replaced since it was read
+            if segment.lookup.get(node.key) is node:
+                segment._move_node_to_end(node)
+
+    def insert(self, key: K, value: V, ttl: Optional[float] = None) -> None:
+        i = self._segment(key)
+
+        with self.locks[i]:
+            if self.buffers:
+                # apply pending reads first so we don't evict something hot
+                self._drain(i)
+
+            self.segments[i].insert(key, value, ttl)
+
+    def get(self, key: K) -> Optional[V]:
+        i = self._segment(key)
+
+        if not self.buffers:
+            with self.locks[i]:
+                return self.segments[i].get(key)
+
+        # dict lookups are atomic (under the GIL, and via per-object locking
+        # on free-threaded builds), so a hit doesn't need the segment lock.
+        # hits and misses are counted without the lock, so on free-threaded
+        # builds these counts may occasionally lose an update
+        segment = self.segments[i]
+        stats = segment.stats
+
+        node = segment.lookup.get(key)
+        if node is None:
+            if segment.disk is not None:
+                # promoting from disk modifies the segment, so take the lock
+                with self.locks[i]:
+                    return segment.get(key)
+
+            if stats is not None:
+                stats.misses += 1
+            return None
+
+        if node.expires is not None and node.expires <= segment.clock():
+            # let the locked path remove (and count) it
+            with self.locks[i]:
+                return segment.get(key)
+
+        buffer = self.buffers[i]
+        buffer.append(node)
+        if stats is not None:
+            # sampled like LRUCache hits: by doing it again, which at worst
+            # records one extra read of the same node
+            hits = stats.hits = stats.hits + 1
+            if hits == stats.next_hit_sample:
+                stats.next_hit_sample += stats.sample_mask + 1
+                start = perf_counter()
+                segment.lookup.get(key)
+                buffer.append(node)
+                stats.record_latency("get", perf_counter() - start)
+
+        # whoever fills the buffer drains it, but never waits for the lock:
+        # if another thread holds it, that thread's insert will drain it
+        if len(buffer) >= self.read_buffer_size and self.locks[i].acquire(blocking=False):
+            try:
+                self._drain(i)
+            finally:
+                self.locks[i].release()
+
         return node.value
+
+    def __len__(self) -> int:
+        return sum(len(segment.lookup) for segment in self.segments)
+
+    def _stats(self) -> Optional[CacheStats]:
+        # loads aren't tied to a segment, so they're recorded in the first one
+        return self.segments[0].stats
+
+    def snapshot(self) -> Dict[str, object]:
+        if self.segments[0].stats is None:
+            raise Exception("Statistics are not enabled")
+
+        total = CacheStats()
+        for i, segment in enumerate(self.segments):
+            with self.locks[i]:
+                total.merge(segment.stats)
+
+        return total.snapshot()
+
+    def dump(self, path: str) -> None:
+        items = []
+        for i, segment in enumerate(self.segments):
+            with self.locks[i]:
+                items.extend(segment.items())
+
+        dump_items(items, path)
+
+    def restore(self, path: str) -> None:
+        for key, value, ttl in load_items(path):
+            self.insert(key, value, ttl)
+
+
+class CompactLRUCache(Generic[K, V]):
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.length = 0
+        self.keys: List[Optional[K]] = [None] * size
+        self.values: List[Optional[V]] = [None] * size
+
+        # 4-byte links are plenty for any cache that fits in memory
+        typecode = "i" if size < 2 ** 31 - 1 else "q"
+
+        # slot `size` is a sentinel that closes the list into a ring:
+        # next[sentinel] is the least recently used slot, prev[sentinel]
+        # the most recently used one. this removes every empty-list special case
+        self.sentinel = size
+        self.prev = array(typecode, [size]) * (size + 1)
+        self.next = array(typecode, [size]) * (size + 1)
+
+        # unused slots are chained through `next`, with -1 ending the chain
+        self.free = 0 if size else -1
+        for slot in range(size):
+            self.next[slot] = slot + 1 if slot + 1 < size else -1
+
+        # a dict from key to slot would cost an int object plus a dict entry
+        # per key, so instead we use an open-addressing hash table of slots
+        # (-1 = empty) with linear probing, kept at most half full
+        self.bits = max(1, (2 * size - 1).bit_length())
+        self.mask = (1 << self.bits) - 1
+        self.table = array(typecode, [-1]) * (1 << self.bits)
+
+    def _home(self, key: K) -> int:
+        # fibonacci hashing spreads out keys whose hashes are sequential or
+        # share low bits, which would otherwise cluster under linear probing
+        return ((hash(key) * 0x9e3779b97f4a7c15) & 0xffffffffffffffff) >> (64 - self.bits)
+
+    def _find(self, key: K) -> int:
+        """ Return the table index holding `key`, or the empty index where it would go. """
+        table = self.table
+        keys = self.keys
+        mask = self.mask
+        # _home, inlined since this is the hot path
+        i = ((hash(key) * 0x9e3779b97f4a7c15) & 0xffffffffffffffff) >> (64 - self.bits)
+
+        while True:
+            slot = table[i]
+            if slot < 0 or keys[slot] == key:
+                return i
+            i = (i + 1) & mask
+
+    def _delete_index(self, i: int) -> None:
+        # backward-shift deletion: rather than leaving a tombstone, pull later
+        # entries of the same probe run back into the hole, as long as that
+        # doesn't move them before their home index
+        table = self.table
+        mask = self.mask
+        table[i] = -1
+        j = i
+
+        while True:
+            j = (j + 1) & mask
+            slot = table[j]
+            if slot < 0:
+                return
+
+            home = self._home(self.keys[slot])
+            # the entry may move into the hole at i unless its home lies in (i, j]
+            if (i < j and (home <= i or home > j)) or (i > j and home <= i and home > j):
+                table[i] = slot
+                table[j] = -1
+                i = j
+
+    def _unlink(self, slot: int) -> None:
+        prev = self.prev[slot]
+        next = self.next[slot]
+        self.next[prev] = next
+        self.prev[next] = prev
+
+    def _link_at_end(self, slot: int) -> None:
+        last = self.prev[self.sentinel]
+        self.next[last] = slot
+        self.prev[slot] = last
+        self.next[slot] = self.sentinel
+        self.prev[self.sentinel] = slot
+
+    def insert(self, key: K, value: V) -> None:
+        if not self.size:
+            return
+
+        i = self._find(key)
+        slot = self.table[i]
+
+        if slot >= 0:
+            # if we're overwriting a key, just move it to the end
+            self.values[slot] = value
+            self._unlink(slot)
+            self._link_at_end(slot)
+            return
+
+        if self.free >= 0:
+            slot = self.free
+            self.free = self.next[slot]
+            self.length += 1
+        else:
+            # no free slots, so reuse the least recently used one. deleting
+            # it may shift entries around, so we have to search again
+            slot = self.next[self.sentinel]
+            self._unlink(slot)
+            self._delete_index(self._find(self.keys[slot]))
+            i = self._find(key)
+
+        self.keys[slot] = key
+        self.values[slot] = value
+        self.table[i] = slot
+        self._link_at_end(slot)
+
+    def get(self, key: K) -> Optional[V]:
+        if not self.size:
+            return None
+
+        slot = self.table[self._find(key)]
+        if slot < 0:
+            return None
+
+        # record the fact that it was used recently
+        self._unlink(slot)
+        self._link_at_end(slot)
+        return self.values[slot]
+
+    def __len__(self) -> int:
+        return self.length
+
+
+class TwoQueueCache(Generic[K, V]):
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        # the paper recommends 25% of the cache for new keys, and remembering
+        # as many dropped keys as fit in half the cache
+        self.in_size = max(1, size // 4)
+        self.out_size = max(1, size // 2)
+
+        self.recent: OrderedDict = OrderedDict()    # A1in, FIFO of new keys
+        self.ghosts: OrderedDict = OrderedDict()    # A1out, keys only
+        self.frequent: OrderedDict = OrderedDict()  # Am, LRU of proven keys
+
+    def _reclaim(self) -> None:
+        if len(self.recent) + len(self.frequent) < self.size:
+            return
+
+        if len(self.recent) > self.in_size or not self.frequent:
+            key, _ = self.recent.popitem(last=False)
+            self.ghosts[key] = None
+            if len(self.ghosts) > self.out_size:
+                self.ghosts.popitem(last=False)
+        else:
+            self.frequent.popitem(last=False)
+
+    def insert(self, key: K, value: V) -> None:
+        if key in self.frequent:
+            self.frequent[key] = value
+            self.frequent.move_to_end(key)
+        elif key in self.recent:
+            # a FIFO doesn't reorder on access, that's what filters out scans
+            self.recent[key] = value
+        elif key in self.ghosts:
+            # seen before, recently enough: it has earned its place
+            del self.ghosts[key]
+            self._reclaim()
+            self.frequent[key] = value
+        elif self.size:
+            self._reclaim()
+            self.recent[key] = value
+
+    def get(self, key: K) -> Optional[V]:
+        if key in self.frequent:
+            self.frequent.move_to_end(key)
+            return self.frequent[key]
+
+        return self.recent.get(key)
+
+
+class ARCCache(Generic[K, V]):
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        # the target size of t1, adapted on every ghost hit
+        self.p = 0
+
+        self.t1: OrderedDict = OrderedDict()  # cached, seen once recently
+        self.t2: OrderedDict = OrderedDict()  # cached, seen at least twice
+        self.b1: OrderedDict = OrderedDict()  # ghosts evicted from t1
+        self.b2: OrderedDict = OrderedDict()  # ghosts evicted from t2
+
+    def _replace(self, in_b2: bool) -> None:
+        # evict from whichever list is over its target, remembering the key
+        if self.t1 and (len(self.t1) > self.p or (in_b2 and len(self.t1) == self.p)):
+            key, _ = self.t1.popitem(last=False)
+            self.b1[key] = None
+        elif self.t2:
+            key, _ = self.t2.popitem(last=False)
+            self.b2[key] = None
+
+    def insert(self, key: K, value: V) -> None:
+        if not self.size:
+            return
+
+        if key in self.t1:
+            del self.t1[key]
+            self.t2[key] = value
+        elif key in self.t2:
+            self.t2[key] = value
+            self.t2.move_to_end(key)
+        elif key in self.b1:
+            # t1 was too small to keep this key: grow its target
+            self.p = min(self.size, self.p + max(len(self.b2) // len(self.b1), 1))
+            self._replace(False)
+            del self.b1[key]
+            self.t2[key] = value
+        elif key in self.b2:
+            # t2 was too small to keep this key: shrink t1's target
+            self.p = max(0, self.p - max(len(self.b1) // len(self.b2), 1))
+            self._replace(True)
+            del self.b2[key]
+            self.t2[key] = value
+        else:
+            l1 = len(self.t1) + len(self.b1)
+            total = l1 + len(self.t2) + len(self.b2)
+
+            if l1 >= self.size:
+                if len(self.t1) < self.size:
+                    self.b1.popitem(last=False)
+                    self._replace(False)
+                else:
+                    # b1 is empty and t1 fills the cache
+                    self.t1.popitem(last=False)
+            elif total >= self.size:
+                if total >= 2 * self.size:
+                    self.b2.popitem(last=False)
+                self._replace(False)
+
+            self.t1[key] = value
+
+    def get(self, key: K) -> Optional[V]:
+        if key in self.t1:
+            # a second access promotes the key to the frequent list
+            value = self.t1.pop(key)
+            self.t2[key] = value
+            return value
+
+        if key in self.t2:
+            self.t2.move_to_end(key)
+            return self.t2[key]
+
+        return None
+
+
+class CountMinSketch:
+    """
+    Approximate access counts in a fixed amount of memory: each key increments
+    one counter in each of `depth` rows, and its estimate is the minimum of
+    those counters (collisions can only inflate a counter, never deflate it).
+    Counters saturate at 15, and after `sample_size` increments every counter
+    is halved, so the sketch tracks recent rather than all-time popularity.
+    """
+
+    SEEDS = (0x9e3779b97f4a7c15, 0xc2b2ae3d27d4eb4f, 0x165667b19e3779f9, 0xd6e8feb86659fd93)
+
+    def __init__(self, width: int, sample_size: int) -> None:
+        self.bits = max(1, (width - 1).bit_length())
+        self.width = 1 << self.bits
+        self.rows = [bytearray(self.width) for _ in self.SEEDS]
+        self.sample_size = sample_size
+        self.additions = 0
+
+    def increment(self, key: Hashable) -> None:
+        h = hash(key)
+        shift = 64 - self.bits
+
+        for row, seed in zip(self.rows, self.SEEDS):
+            i = ((h * seed) & 0xffffffffffffffff) >> shift
+            if row[i] < 15:
+                row[i] += 1
+
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self._age()
+
+    def estimate(self, key: Hashable) -> int:
+        h = hash(key)
+        shift = 64 - self.bits
+
+        count = 15
+        for row, seed in zip(self.rows, self.SEEDS):
+            c = row[((h * seed) & 0xffffffffffffffff) >> shift]
+            if c < count:
+                count = c
+
+        return count
+
+    def _age(self) -> None:
+        halve = bytes(c >> 1 for c in range(256))
+        self.rows = [row.translate(halve) for row in self.rows]
+        self.additions //= 2
+
+
+class TinyLFUCache(Generic[K, V]):
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        # 1% window, and the main cache split 20/80 into probation/protected
+        self.window_size = max(1, size // 100) if size > 1 else size
+        main_size = size - self.window_size
+        self.protected_size = main_size * 4 // 5
+        self.main_size = main_size
+
+        self.window: OrderedDict = OrderedDict()
+        self.probation: OrderedDict = OrderedDict()
+        self.protected: OrderedDict = OrderedDict()
+
+        self.sketch = CountMinSketch(max(16, size), sample_size=max(16, 10 * size))
+
+    def _promote(self, key: K, value: V) -> None:
+        # a probation hit moves into protected, demoting protected's LRU if full
+        del self.probation[key]
+        self.protected[key] = value
+
+        if len(self.protected) > self.protected_size:
+            demoted, demoted_value = self.protected.popitem(last=False)
+            self.probation[demoted] = demoted_value
+
+    def _admit(self, key: K, value: V) -> None:
+        if len(self.probation) + len(self.protected) < self.main_size:
+            self.probation[key] = value
+            return
+
+        # the candidate has to beat the main cache's least valuable entry
+        victims = self.probation or self.protected
+        if not victims:
+            return
+
+        victim = next(iter(victims))
+        if self.sketch.estimate(key) > self.sketch.estimate(victim):
+            del victims[victim]
+            self.probation[key] = value
+
+    def insert(self, key: K, value: V) -> None:
+        self.sketch.increment(key)
+
+        if key in self.window:
+            self.window[key] = value
+            self.window.move_to_end(key)
+        elif key in self.protected:
+            self.protected[key] = value
+            self.protected.move_to_end(key)
+        elif key in self.probation:
+            self._promote(key, value)
+        elif self.size:
+            self.window[key] = value
+
+            if len(self.window) > self.window_size:
+                candidate, candidate_value = self.window.popitem(last=False)
+                self._admit(candidate, candidate_value)
+
+    def get(self, key: K) -> Optional[V]:
+        self.sketch.increment(key)
+
+        if key in self.window:
+            self.window.move_to_end(key)
+            return self.window[key]
+
+        if key in self.protected:
+            self.protected.move_to_end(key)
+            return self.protected[key]
+
+        if key in self.probation:
+            value = self.probation[key]
+            self._promote(key, value)
+            return value
+
+        return None
+
+
+POLICIES: Dict[str, Callable[[int], object]] = {
+    "lru": LRUCache,
+    "2q": TwoQueueCache,
+    "arc": ARCCache,
+    "tinylfu": TinyLFUCache,
+}
+
+
+def make_cache(size: int, policy: str = "lru"):
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy {policy!r}")
+
+    return POLICIES[policy](size)
+
+
+def load_trace(path: str) -> List[str]:
+    """ Read a recorded trace, one key per line. """
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def replay(trace: Iterable[Hashable], size: int, policies: Iterable[str] = POLICIES) -> Dict[str, Dict[str, float]]:
+    """
+    Feed a key trace through each policy as a read-through cache (get, and
+    insert on a miss) and report the hit ratio and mean latency per access.
+    """
+    from time import perf_counter
+
+    trace = list(trace)
+    results = {}
+
+    for policy in policies:
+        cache = make_cache(size, policy)
+        hits = 0
+
+        start = perf_counter()
+        for key in trace:
+            if cache.get(key) is None:
+                cache.insert(key, key)
+            else:
+                hits += 1
+        elapsed = perf_counter() - start
+
+        results[policy] = {
+            "hit_ratio": hits / len(trace) if trace else 0.0,
+            "latency_us": elapsed / len(trace) * 1e6 if trace else 0.0,
+        }
+
+    return results
+
+
+def synthetic_trace(length: int = 500_000, keys: int = 50_000, scan_every: int = 100_000,
+                    scan_length: int = 20_000, seed: int = 0) -> List[int]:
+    """ A zipf-ish workload, interrupted by a scan over never-repeated keys every so often. """
+    import random
+
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(keys)]
+    trace = rng.choices(range(keys), weights, k=length)
+
+    next_scan_key = keys
+    for at in range(scan_every, length, scan_every):
+        trace[at:at] = range(next_scan_key, next_scan_key + scan_length)
+        next_scan_key += scan_length
+
+    return trace
+
+
+# separates positional from keyword arguments in memoize's keys
+_KWARGS_MARK = object()
+
+
+def memoize(size: int = 128, ttl: Optional[float] = None, **options):
+    """
+    Cache a function's results by its arguments, like functools.lru_cache but
+    with a TTL and weighted capacity, and with concurrent calls for the same
+    arguments coalesced into one. Works on both plain and async functions.
+    Arguments must be hashable, and a None result is never cached.
+    With a weigher, the cache is a single segment, so that the whole weight
+    budget is shared by every entry.
+    """
+    if options.get("weigher") is not None:
+        options.setdefault("segments", 1)
+
+    def decorator(func):
+        cache = ConcurrentLRUCache(size, ttl=ttl, **options)
+
+        def make_key(args, kwargs):
+            # the marker keeps f(a=1) apart from f((), (("a", 1),)), like functools does
+            return args + (_KWARGS_MARK,) + tuple(sorted(kwargs.items())) if kwargs else args
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await cache.aget_or_load(make_key(args, kwargs), lambda _: func(*args, **kwargs))
+
+            async_wrapper.cache = cache
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return cache.get_or_load(make_key(args, kwargs), lambda _: func(*args, **kwargs))
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+class LockedLRUCache(LRUCache[K, V]):
+    """ A single LRUCache behind one lock, as a baseline for the benchmark. """
+
+    def __init__(self, size: int) -> None:
+        super().__init__(size)
+        self.lock = threading.Lock()
+
+    def insert(self, key: K, value: V, ttl: Optional[float] = None) -> None:
+        with self.lock:
+            super().insert(key, value, ttl)
+
+    def get(self, key: K) -> Optional[V]:
+        with self.lock:
+            return super().get(key)
+
+
+def benchmark_threads(ops: int = 200_000, size: int = 10_000) -> None:
+    """
+    Run a 90% read / 10% write workload from a growing thread pool. With the
+    GIL, threads mostly take turns, so expect near-linear scaling only on a
+    free-threaded build (python3.13t and later).
+    """
+    import random
+    import sys
+    from concurrent.futures import ThreadPoolExecutor
+    from time import perf_counter
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"GIL enabled: {gil}")
+
+    caches = {
+        "locked": lambda: LockedLRUCache(size),
+        "segmented": lambda: ConcurrentLRUCache(size),
+        "buffered": lambda: ConcurrentLRUCache(size, read_buffer_size=64),
+    }
+
+    for name, make in caches.items():
+        for threads in (1, 2, 4, 8):
+            cache = make()
+            for k in range(size):
+                cache.insert(k, k)
+
+            def work(seed: int) -> None:
+                rng = random.Random(seed)
+                for _ in range(ops // threads):
+                    k = rng.randrange(2 * size)
+                    if rng.random() < 0.9:
+                        cache.get(k)
+                    else:
+                        cache.insert(k, k)
+
+            start = perf_counter()
+            with ThreadPoolExecutor(threads) as pool:
+                list(pool.map(work, range(threads)))
+            elapsed = perf_counter() - start
+
+            print(f"{name:>10} x{threads}: {ops / elapsed:>12,.0f} ops/s")
+
+
+def benchmark_storage(n: int = 1_000_000) -> None:
+    """ Compare bytes per entry (excluding the keys and values themselves) and ops/s. """
+    import tracemalloc
+    from time import perf_counter
+
+    # large ints, so none of them are the interpreter's cached small ints
+    keys = list(range(10 ** 9, 10 ** 9 + 2 * n))
+
+    for cache_type in (LRUCache, CompactLRUCache):
+        tracemalloc.start()
+        cache = cache_type(n)
+        for k in keys[:n]:
+            cache.insert(k, k)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        start = perf_counter()
+        for k in keys[:n]:
+            cache.get(k)
+        for k in keys[n:]:
+            cache.insert(k, k)
+        elapsed = perf_counter() - start
+
+        print(f"{cache_type.__name__:>16}: {memory / n:6.1f} bytes/entry, {2 * n / elapsed:>12,.0f} ops/s")
+
+
+def benchmark_stats(gets: int = 500_000, rounds: int = 21) -> None:
+    """
+    The cost of recording statistics on the hit path, where it's felt the
+    most: a cache small enough to stay in the CPU caches, and a bigger one.
+    """
+    import random
+
+    def run(keys: List[int], record_stats: bool) -> float:
+        cache = LRUCache(len(keys), record_stats=record_stats)
+        for k in keys:
+            cache.insert(k, k)
+        get = cache.get
+
+        start = perf_counter()
+        for _ in range(gets // len(keys)):
+            for k in keys:
+                get(k)
+        return perf_counter() - start
+
+    for size in (10_000, 100_000):
+        keys = list(range(size))
+        random.Random(0).shuffle(keys)
+
+        # interleave the runs and keep the best of each: noise only ever adds time
+        off, on = float("inf"), float("inf")
+        for _ in range(rounds):
+            off = min(off, run(keys, False))
+            on = min(on, run(keys, True))
+
+        print(f"{size:>7,} hits: stats off {gets / off:>12,.0f} ops/s, on {gets / on:>12,.0f} ops/s, "
+              f"overhead {(on / off - 1) * 100:.1f}%")
+
+
+def benchmark_policies(size: int = 2_000) -> None:
+    import sys
+
+    trace = load_trace(sys.argv[1]) if len(sys.argv) > 1 else synthetic_trace()
+    for policy, result in replay(trace, size).items():
+        print(f"{policy:>8}: hit ratio {result['hit_ratio']:.3f}, {result['latency_us']:.2f} us/op")
+
+
+if __name__ == "__main__":
+    benchmark_stats()
+    benchmark_policies()
+    benchmark_storage()
+    benchmark_threads()
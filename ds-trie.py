@@ -11,37 +11,644 @@
 
     In a different language, you might choose to store children in a fixed-size
     array (with the number of elements being the size of the alphabet).
+
+    A plain trie spends a whole node on every character, even along long
+    chains with no branching (e.g. the "ectomy" in "appendectomy"). A radix
+    (or Patricia) trie compresses such chains into a single edge labelled
+    with the whole substring, so the number of nodes is at most twice the
+    number of words. Inserting may then have to split an edge in two where
+    a new word diverges from it part way through.
+
+    For autocomplete, each node also remembers the largest weight anywhere
+    below it. Searching best-first on that bound (always expanding whichever
+    node could still contain the heaviest word) finds the top k completions
+    while only visiting the nodes on the way to them, rather than collecting
+    and sorting the whole subtree.
+
+    Once built, a trie that never changes again can be frozen into a few flat
+    arrays instead of millions of node objects. Nodes are numbered in
+    level order (breadth-first, children sorted), the same order LOUDS uses,
+    which makes each node's children consecutive: a node only has to store
+    where its children start and how many there are. Edge labels go into
+    one big byte string. Since the result is just bytes, it can be written
+    to a file once and then mmap-ed by every process that needs it, sharing
+    the same physical pages, with lookups reading the buffer directly.
+
+    Tries also make fuzzy search (e.g. spelling correction) cheap. Comparing
+    a word against every word in a dictionary costs a whole edit distance
+    table per dictionary word (see alg-edit-distance.py). But the table for
+    a dictionary word only adds one row per letter to the table of its
+    prefix, so walking the trie we only need to compute one row per node
+    letter, shared by every word below it. And since no entry in a row can
+    go down again further along, once a row's smallest entry is over the
+    limit the whole subtree can be skipped. Alternatively, the rows can be
+    replaced by the states of a Levenshtein automaton: only the entries
+    still within the limit are kept, so there are finitely many distinct
+    states and their transitions can be cached, turning it into a DFA.
 '''
 
+import heapq
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import deque
+from time import perf_counter
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+
 class TrieNode:
-    def __init__(self, char: str) -> None:
-        self.value = char
+    # no per-instance __dict__: with millions of nodes this matters
+    __slots__ = ('label', 'terminator', 'weight', 'best', 'children')
+
+    def __init__(self, label: str = '') -> None:
+        self.label = label
         self.terminator = False
+        self.weight = 0
+        # an upper bound on the weight of any word in this subtree
+        self.best = 0
         self.children = {}
 
-    def insert(self, string: str) -> None:
-        if not string:
-            self.terminator = True
-            return
+    def insert(self, string: str, weight: int = 0) -> None:
+        node = self
+        path = [node]
+        i = 0
+
+        while i < len(string):
+            child = node.children.get(string[i])
+
+            if not child:
+                # nothing shares this prefix, so the rest becomes a single edge
+                child = TrieNode(string[i:])
+                node.children[string[i]] = child
+                node = child
+                path.append(node)
+                break
+
+            label = child.label
+            if not string.startswith(label, i):
+                # the new word diverges part way along this edge: split it
+                j = 0
+                while i + j < len(string) and label[j] == string[i + j]:
+                    j += 1
+
+                middle = TrieNode(label[:j])
+                middle.best = child.best
+                child.label = label[j:]
+                middle.children[child.label[0]] = child
+                node.children[string[i]] = middle
+                child = middle
+
+            node = child
+            path.append(node)
+            i += len(child.label)
+
+        node.terminator = True
+        node.weight = weight
+
+        for n in path:
+            if weight > n.best:
+                n.best = weight
+
+    def _locate(self, string: str) -> Optional['TrieNode']:
+        ''' Return the node at the end of exactly `string`, if there is one. '''
+        node = self
+        i = 0
+
+        while i < len(string):
+            node = node.children.get(string[i])
+            if not node or not string.startswith(node.label, i):
+                return None
+            i += len(node.label)
+
+        return node
+
+    def find(self, string: str) -> bool:
+        node = self._locate(string)
+        return bool(node and node.terminator)
+
+    def _locate_prefix(self, prefix: str) -> Optional[Tuple['TrieNode', str]]:
+        '''
+            Return the first node whose path starts with `prefix`, along with
+            that path. The prefix may end part way along the node's edge.
+        '''
+        node = self
+        i = 0
+
+        while i < len(prefix):
+            child = node.children.get(prefix[i])
+            if not child:
+                return None
+
+            label = child.label
+            if len(prefix) - i <= len(label):
+                if not label.startswith(prefix[i:]):
+                    return None
+                return child, prefix[:i] + label
+
+            if not prefix.startswith(label, i):
+                return None
+
+            node = child
+            i += len(label)
+
+        return node, prefix
+
+    def has_prefix(self, prefix: str) -> bool:
+        return self._locate_prefix(prefix) is not None
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Tuple[str, int]]:
+        ''' The `limit` heaviest words starting with `prefix`, heaviest first. '''
+        located = self._locate_prefix(prefix)
+        if not located:
+            return []
+
+        node, path = located
+
+        # a max-heap (via negated keys) of both finished words and subtrees
+        # that might still contain heavier words. ties go to words over
+        # subtrees, then alphabetically; paths are unique, so nodes are
+        # never compared with each other
+        heap = [(-node.best, 1, path, node)]
+        results = []
+
+        while heap and len(results) < limit:
+            key, kind, path, node = heapq.heappop(heap)
+
+            if kind == 0:
+                results.append((path, -key))
+                continue
+
+            if node.terminator:
+                heapq.heappush(heap, (-node.weight, 0, path, None))
+
+            for child in node.children.values():
+                heapq.heappush(heap, (-child.best, 1, path + child.label, child))
+
+        return results
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        ''' Every (word, weight) in the trie, in sorted order. '''
+        stack = [(self, self.label)]
+
+        while stack:
+            node, path = stack.pop()
+            if node.terminator:
+                yield path, node.weight
+
+            # push in reverse, so the smallest child is popped first
+            for key in sorted(node.children, reverse=True):
+                child = node.children[key]
+                stack.append((child, path + child.label))
+
+    def fuzzy_find(self, word: str, max_distance: int, automaton: bool = False) -> List[Tuple[str, int]]:
+        ''' Every (match, distance) within `max_distance` edits of `word`, closest first. '''
+        if automaton:
+            return self._fuzzy_find_automaton(word, max_distance)
+
+        # the edit distance table row for the empty prefix
+        row = list(range(len(word) + 1))
+        for letter in self.label:
+            row = _next_row(row, word, letter)
+
+        stack = [(self, self.label, row)]
+        results = []
+
+        while stack:
+            node, path, row = stack.pop()
+            if node.terminator and row[-1] <= max_distance:
+                results.append((path, row[-1]))
+
+            for child in node.children.values():
+                child_row = row
+                for letter in child.label:
+                    child_row = _next_row(child_row, word, letter)
+                    if min(child_row) > max_distance:
+                        break
+                else:
+                    stack.append((child, path + child.label, child_row))
+
+        results.sort(key=lambda result: (result[1], result[0]))
+        return results
+
+    def _fuzzy_find_automaton(self, word: str, max_distance: int) -> List[Tuple[str, int]]:
+        automaton = LevenshteinAutomaton(word, max_distance)
+
+        state = automaton.start()
+        for letter in self.label:
+            state = automaton.step(state, letter)
+
+        stack = [(self, self.label, state)]
+        results = []
+
+        while stack:
+            node, path, state = stack.pop()
+            if node.terminator:
+                distance = automaton.distance(state)
+                if distance is not None:
+                    results.append((path, distance))
+
+            for child in node.children.values():
+                child_state = state
+                for letter in child.label:
+                    child_state = automaton.step(child_state, letter)
+                    if not child_state[0]:
+                        break
+                else:
+                    stack.append((child, path + child.label, child_state))
+
+        results.sort(key=lambda result: (result[1], result[0]))
+        return results
+
+    @classmethod
+    def build_from_sorted(cls, items: Iterable[Union[str, Tuple[str, int]]]) -> 'TrieNode':
+        '''
+            Build a trie from words (or (word, weight) pairs) in sorted order.
+
+            In sorted input, each word shares its longest common prefix with
+            the word just before it, so we only ever need to touch the
+            rightmost path of the trie, which we keep on a stack. Anything
+            that falls off the stack is finished and never visited again,
+            making this O(total length) instead of a search from the root
+            per word.
+        '''
+        root = cls()
+        # (node, length of the string spelled out from the root to it)
+        stack = [(root, 0)]
+        prev = None
+
+        for item in items:
+            word, weight = (item, 0) if isinstance(item, str) else item
+
+            if prev is not None and word < prev:
+                raise ValueError('Input must be sorted')
+
+            if word == prev:
+                node = stack[-1][0]
+                node.weight = weight
+                node.best = max(node.best, weight)
+                continue
+
+            lcp = len(os.path.commonprefix([prev, word])) if prev is not None else 0
+
+            while stack[-1][1] > lcp:
+                node, depth = stack.pop()
+                parent, parent_depth = stack[-1]
+
+                if parent_depth < lcp:
+                    # the new word branches off part way along this edge
+                    cut = lcp - parent_depth
+                    middle = cls(node.label[:cut])
+                    middle.best = node.best
+                    node.label = node.label[cut:]
+                    middle.children[node.label[0]] = node
+                    parent.children[middle.label[0]] = middle
+                    stack.append((middle, lcp))
+                    break
+
+                if node.best > parent.best:
+                    parent.best = node.best
+
+            parent = stack[-1][0]
+            if lcp == len(word):
+                # only possible for the empty string, which is the root
+                node = parent
+            else:
+                node = cls(word[lcp:])
+                parent.children[word[lcp]] = node
+                stack.append((node, len(word)))
+
+            node.terminator = True
+            node.weight = weight
+            node.best = max(node.best, weight)
+            prev = word
 
-        letter = string[0]
-        node = self.children.get(letter)
+        while len(stack) > 1:
+            node, _ = stack.pop()
+            parent = stack[-1][0]
+            if node.best > parent.best:
+                parent.best = node.best
 
-        if not node:
-            node = TrieNode(letter)
-            self.children[letter] = node
+        return root
 
-        node.insert(string[1:])
+
+def _next_row(row: List[int], word: str, letter: str) -> List[int]:
+    ''' The next row of the edit distance table between `word` and a string, after adding `letter`. '''
+    next_row = [row[0] + 1]
+    for j in range(1, len(row)):
+        if word[j - 1] == letter:
+            next_row.append(row[j - 1])
+        else:
+            next_row.append(1 + min(next_row[j - 1], row[j], row[j - 1]))
+    return next_row
+
+
+class LevenshteinAutomaton:
+    '''
+        Accepts the strings within `max_distance` edits of `word`.
+
+        A state is a sparse edit distance row: the positions in `word` whose
+        entry is still within the limit, and those entries. A state with no
+        positions left can never accept. Transitions are cached, so after a
+        while stepping is a single dict lookup.
+    '''
+
+    def __init__(self, word: str, max_distance: int) -> None:
+        self.word = word
+        self.max_distance = max_distance
+        self.transitions = {}
+
+    def start(self) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+        positions = tuple(range(min(len(self.word), self.max_distance) + 1))
+        return positions, positions
+
+    def step(self, state, letter: str):
+        transition = self.transitions.get((state, letter))
+        if transition is not None:
+            return transition
+
+        positions, values = state
+        word = self.word
+        limit = self.max_distance
+        next_positions = []
+        next_values = []
+
+        if positions and positions[0] == 0 and values[0] < limit:
+            next_positions.append(0)
+            next_values.append(values[0] + 1)
+
+        for k, i in enumerate(positions):
+            if i == len(word):
+                break
+
+            # replace (or match), then insert, then delete; a position missing
+            # from the state is over the limit, so can't give the minimum
+            value = values[k] + (word[i] != letter)
+            if next_positions and next_positions[-1] == i:
+                value = min(value, next_values[-1] + 1)
+            if k + 1 < len(positions) and positions[k + 1] == i + 1:
+                value = min(value, values[k + 1] + 1)
+
+            if value <= limit:
+                next_positions.append(i + 1)
+                next_values.append(value)
+
+        transition = (tuple(next_positions), tuple(next_values))
+        self.transitions[(state, letter)] = transition
+        return transition
+
+    def distance(self, state) -> Optional[int]:
+        ''' The edit distance if `state` accepts, otherwise None. '''
+        positions, values = state
+        if positions and positions[-1] == len(self.word):
+            return values[-1]
+        return None
+
+
+class FrozenTrie:
+    '''
+        A read-only trie over the UTF-8 bytes of its words, stored as:
+
+            weight[n]        int64, the weight of each node's word
+            first_child[n]   uint32, the number of the node's first child
+            label_offset[n]  uint32, where the node's edge label starts
+            label_length[n]  uint32
+            child_count[n]   uint16, at most 256 since children differ in their first byte
+            branch[n]        uint8, the first byte of the node's edge label
+            terminator[n]    uint8
+            labels           every edge label, concatenated
+
+        Finding a child is a search for one byte among the (consecutive)
+        `branch` bytes of the node's children, which bytes.find does in C.
+    '''
+
+    MAGIC = b'FTRIE1'
+    HEADER = struct.Struct('<6s2sII')
+
+    def __init__(self, buffer) -> None:
+        magic, byteorder, n, labels_length = self.HEADER.unpack_from(buffer, 0)
+        if magic != self.MAGIC:
+            raise ValueError('Not a frozen trie')
+
+        # the arrays are in native byte order, so only load on a matching machine
+        if byteorder != sys.byteorder[:2].encode():
+            raise ValueError('Frozen trie was written with a different byte order')
+
+        self.buffer = buffer
+        self.view = memoryview(buffer)
+        self.n = n
+
+        offset = self.HEADER.size
+        self.weight, offset = self._array(offset, 'q', n)
+        self.first_child, offset = self._array(offset, 'I', n)
+        self.label_offset, offset = self._array(offset, 'I', n)
+        self.label_length, offset = self._array(offset, 'I', n)
+        self.child_count, offset = self._array(offset, 'H', n)
+        self.branch_start = offset
+        self.branch, offset = self._array(offset, 'B', n)
+        self.terminator, offset = self._array(offset, 'B', n)
+        self.labels_start = offset
+
+        self.map = None
+
+    def _array(self, offset: int, typecode: str, n: int):
+        # every array starts on a multiple of its own item size
+        size = struct.calcsize(typecode)
+        offset += -offset % size
+        return self.view[offset:offset + n * size].cast(typecode), offset + n * size
+
+    @staticmethod
+    def freeze(root: TrieNode) -> bytes:
+        # re-key the trie by UTF-8 bytes (latin-1 maps each byte to one
+        # character) so that sibling edges never share a first byte
+        byte_trie = TrieNode.build_from_sorted(
+            (word.encode('utf8').decode('latin-1'), weight) for word, weight in root.items()
+        )
+
+        weight = array('q')
+        first_child = array('I')
+        label_offset = array('I')
+        label_length = array('I')
+        child_count = array('H')
+        branch = array('B')
+        terminator = array('B')
+        labels = bytearray()
+
+        # number the nodes breadth-first: by the time we process a node,
+        # its children will be the next len(children) numbers handed out
+        queue = deque([byte_trie])
+        numbered = 1
+
+        while queue:
+            node = queue.popleft()
+            label = node.label.encode('latin-1')
+
+            weight.append(node.weight)
+            first_child.append(numbered)
+            label_offset.append(len(labels))
+            label_length.append(len(label))
+            child_count.append(len(node.children))
+            branch.append(label[0] if label else 0)
+            terminator.append(node.terminator)
+            labels += label
+
+            for key in sorted(node.children):
+                queue.append(node.children[key])
+            numbered += len(node.children)
+
+        out = bytearray(FrozenTrie.HEADER.pack(
+            FrozenTrie.MAGIC, sys.byteorder[:2].encode(), len(weight), len(labels)
+        ))
+        for a in (weight, first_child, label_offset, label_length, child_count, branch, terminator):
+            out += bytes(-len(out) % a.itemsize)
+            out += a.tobytes()
+        out += labels
+
+        return bytes(out)
+
+    @staticmethod
+    def save(root: TrieNode, path: str) -> None:
+        with open(path, 'wb') as f:
+            f.write(FrozenTrie.freeze(root))
+
+    @classmethod
+    def load(cls, path: str) -> 'FrozenTrie':
+        ''' Map a saved trie into memory. Nothing is read until it's used. '''
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        trie = cls(buffer)
+        trie.map = buffer
+        return trie
+
+    def close(self) -> None:
+        # every view into an mmap has to be released before it can be closed
+        for a in (self.weight, self.first_child, self.label_offset, self.label_length,
+                  self.child_count, self.branch, self.terminator, self.view):
+            a.release()
+
+        if self.map is not None:
+            self.map.close()
+
+    def _label(self, node: int) -> bytes:
+        start = self.labels_start + self.label_offset[node]
+        return bytes(self.view[start:start + self.label_length[node]])
+
+    def _child(self, node: int, byte: int) -> int:
+        start = self.branch_start + self.first_child[node]
+        i = self.buffer.find(bytes((byte,)), start, start + self.child_count[node])
+        return i - self.branch_start if i >= 0 else -1
+
+    def _walk(self, key: bytes) -> Tuple[int, int, int]:
+        '''
+            Follow `key` as far as it goes. Returns the last node reached, where
+            in the key that node's edge starts, and how much of the key matched
+            in total (which may end part way along the node's edge).
+        '''
+        node = 0
+        start = i = 0
+
+        while i < len(key):
+            child = self._child(node, key[i])
+            if child < 0:
+                break
+
+            label = self._label(child)
+            start = i
+            if not key.startswith(label, i):
+                # count how much of the edge still matched
+                j = 1
+                while j < len(label) and i + j < len(key) and label[j] == key[i + j]:
+                    j += 1
+                return child, start, i + j
+
+            node = child
+            i += len(label)
+
+        return node, start, i
 
     def find(self, string: str) -> bool:
-        if not string:
-            return node.terminator
+        key = string.encode('utf8')
+        node, start, matched = self._walk(key)
+        # a word must end exactly at the end of a node's edge
+        return (matched == len(key) and start + self.label_length[node] == len(key)
+                and bool(self.terminator[node]))
+
+    def has_prefix(self, prefix: str) -> bool:
+        key = prefix.encode('utf8')
+        return self._walk(key)[2] == len(key)
+
+    def items(self, prefix: str = '') -> Iterator[Tuple[str, int]]:
+        ''' Every (word, weight) starting with `prefix`, in sorted order. '''
+        key = prefix.encode('utf8')
+        node, start, matched = self._walk(key)
+        if matched < len(key):
+            return
+
+        stack = [(node, key[:start] + self._label(node))]
+
+        while stack:
+            node, path = stack.pop()
+            if self.terminator[node]:
+                yield path.decode('utf8'), self.weight[node]
+
+            # push in reverse, so the smallest child is popped first
+            first = self.first_child[node]
+            for child in range(first + self.child_count[node] - 1, first - 1, -1):
+                stack.append((child, path + self._label(child)))
 
-        node = self.children.get(string[0])
-        if node:
-            return node.find(string[1:)
-        
-        return False
-        
 
 trie = TrieNode('')
+
+
+def benchmark_fuzzy(n: int = 1_000_000, queries: int = 20, max_distance: int = 2, sample: int = 20_000) -> None:
+    '''
+        fuzzy_find against comparing the query with every word. The scan is
+        timed over `sample` words and scaled up to the whole dictionary.
+    '''
+    import random
+    import string
+
+    rng = random.Random(0)
+    words = sorted({
+        ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 12)))
+        for _ in range(n)
+    })
+    root = TrieNode.build_from_sorted(words)
+
+    # misspell some dictionary words
+    targets = []
+    for word in rng.sample(words, queries):
+        i = rng.randrange(len(word))
+        targets.append(word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:])
+
+    def scan(target: str, dictionary: List[str]) -> List[Tuple[str, int]]:
+        results = []
+        for word in dictionary:
+            row = list(range(len(target) + 1))
+            for letter in word:
+                row = _next_row(row, target, letter)
+            if row[-1] <= max_distance:
+                results.append((word, row[-1]))
+        return results
+
+    start = perf_counter()
+    for target in targets:
+        scan(target, words[:sample])
+    brute = (perf_counter() - start) / queries * len(words) / sample
+
+    print(f'{len(words):,} words, distance <= {max_distance}')
+    print(f'{"brute force":>12}: {brute * 1000:>10,.1f} ms/query (extrapolated)')
+
+    for automaton in (False, True):
+        start = perf_counter()
+        for target in targets:
+            root.fuzzy_find(target, max_distance, automaton=automaton)
+        elapsed = (perf_counter() - start) / queries
+        name = 'automaton' if automaton else 'trie rows'
+        print(f'{name:>12}: {elapsed * 1000:>10,.1f} ms/query, {brute / elapsed:,.0f}x faster')
+
+
+if __name__ == '__main__':
+    benchmark_fuzzy()